@@ -0,0 +1,62 @@
+"""
+Benchmark of the voxel-to-cartesian transform: matrix product (utils.geometry) vs. the former pandas shearing.
+
+Run from the repository root: python benchmarks/grid_transform.py
+"""
+import sys
+from pathlib import Path
+from timeit import default_timer as timer
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.utils.geometry import grid_coordinates  # noqa: E402
+
+# sheared (hexagonal) voxel, as for the Be example
+VOXEL = np.array([[0.12, 0.0, 0.0], [-0.06, 0.104, 0.0], [0.0, 0.0, 0.13]])
+
+
+def pandas_transform(density, voxel):
+    """
+    The transform as previously done in update_dataframes (meshgrid, DataFrame, column-wise shearing)
+    """
+    coord_arr = np.column_stack(
+        list(map(np.ravel, np.meshgrid(*map(np.arange, density.shape), indexing="ij")))
+        + [density.ravel()]
+    )
+    data0 = pd.DataFrame(coord_arr, columns=["x", "y", "z", "val"])
+    data0["x"] *= voxel[0][0]
+    data0["y"] *= voxel[1][1]
+    data0["z"] *= voxel[2][2]
+    data_sc = data0.copy()
+    data_sc.x += voxel[1][0] * (data0.y / voxel[1][1])
+    data_sc.x += voxel[2][0] * (data0.z / voxel[2][2])
+    data_sc.y += voxel[0][1] * (data0.x / voxel[0][0])
+    data_sc.y += voxel[2][1] * (data0.z / voxel[2][2])
+    data_sc.z += voxel[1][2] * (data0.y / voxel[1][1])
+    data_sc.z += voxel[0][2] * (data0.x / voxel[0][0])
+    return data_sc[["x", "y", "z"]].to_numpy()
+
+
+def matrix_transform(density, voxel):
+    return grid_coordinates(density.shape, voxel).reshape(-1, 3)
+
+
+def best_of(fn, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = timer()
+        fn(*args)
+        times.append(timer() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    print(f"{'grid':>6} {'pandas [s]':>12} {'matrix [s]':>12} {'speedup':>8} {'max. deviation':>15}")
+    for n in [20, 50, 100, 150, 200]:
+        density = np.random.random((n, n, n))
+        deviation = np.abs(pandas_transform(density, VOXEL) - matrix_transform(density, VOXEL)).max()
+        t_pandas = best_of(pandas_transform, density, VOXEL)
+        t_matrix = best_of(matrix_transform, density, VOXEL)
+        print(f"{n:>4}^3 {t_pandas:>12.4f} {t_matrix:>12.4f} {t_pandas / t_matrix:>7.1f}x {deviation:>15.2e}")
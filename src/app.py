@@ -2,6 +2,7 @@
 import base64
 import json
 import os
+import time
 from pathlib import Path
 from timeit import default_timer as timer
 
@@ -16,8 +17,29 @@ from dash.exceptions import PreventUpdate
 
 # utils
 from src.components import menu, settings, footer, main
+from src.utils.admission import AdmissionController, CostEstimator
+from src.utils.atoms_store import AtomsStore
+from src.utils.atoms_table import atom_columns, atoms_page
+from src.utils.batch import run_frame
+from src.utils.coalescing import RequestCoalescer
+from src.utils.dataset_cache import DatasetCache
+from src.utils.encoding import encode_array, encode_columns, decode_columns
 from src.utils.exceptions import upload_exception
-from src.utils.mala_inference import run_mala_prediction
+from src.utils.frames import FrameIndex
+from src.utils.geometry import (
+    cell_outline, cell_planes, grid_coordinates, resample_cartesian, stratified_sample, tile_offsets, tile_points
+)
+from src.utils.inference_jobs import JobQueue
+from src.utils.isosurface import MeshCache, isosurface_mesh
+from src.utils.mala_inference import (
+    run_mala_prediction, run_from_ldos, run_temperature_sweep, run_total_energy, init_worker, PRELOAD_MODELS
+)
+from src.utils.result_cache import ResultCache
+from src.utils.pyramid import build_pyramid, extend_pyramid, pyramid_level, slice_pyramid
+from src.utils.raster import colormap, encode_png, plane_values
+from src.utils.supercell import find_supercell, reduce_supercell, tile_result
+from src.utils.slicing import fractional_axis
+from src.utils.value_index import build_value_index
 
 # visualization
 import pandas as pd
@@ -34,9 +56,56 @@ import dash_uploader as du
 
 
 # CONSTANTS
-ATOM_LIMIT = 200
-# TODO implement caching of the dataset to improve performance
-# as in: https://dash.plotly.com/performance
+# Send density data (unique_df, plot data and patches) as base64 typed arrays instead of JSON number lists.
+# Opt-in, needs a Dash version bundling plotly.js >= 2.28 (decodes {"dtype", "bdata"} arrays natively)
+BINARY_ENCODING = os.environ.get("MALAWEB_BINARY_ENCODING", "0") == "1"
+# Number of worker processes running inferences in the background
+INFERENCE_WORKERS = int(os.environ.get("MALAWEB_INFERENCE_WORKERS", 1))
+# Size cap (MB) of the cache of inference results, shared by all sessions
+RESULT_CACHE_SIZE = int(os.environ.get("MALAWEB_RESULT_CACHE_SIZE", 1024))
+# Memory (MB) all running inferences may use together - defaults to 80% of the machine's memory
+INFERENCE_MEMORY_BUDGET = int(
+    os.environ.get(
+        "MALAWEB_INFERENCE_MEMORY_BUDGET",
+        0.8 * os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**2,
+    )
+)
+# Longest (estimated) run time of a single inference or total energy job in seconds, longer ones are rejected
+# (the total energy of an inference never runs inline, it is a job of its own, see start_total_energy)
+MAX_INFERENCE_TIME = int(os.environ.get("MALAWEB_MAX_INFERENCE_TIME", 3600))
+# Number of frames of a trajectory a batch inference may run on
+MAX_BATCH_FRAMES = int(os.environ.get("MALAWEB_MAX_BATCH_FRAMES", 200))
+# Number of temperatures a sweep may evaluate
+MAX_SWEEP_TEMPERATURES = int(os.environ.get("MALAWEB_MAX_SWEEP_TEMPERATURES", 100))
+# Number of steps of the density slider and whether they are quantiles ("quantile") or evenly spaced values ("absolute")
+VALUE_STEPS = int(os.environ.get("MALAWEB_VALUE_STEPS", 200))
+VALUE_SLIDER_MODE = os.environ.get("MALAWEB_VALUE_SLIDER", "quantile")
+# Grids up to this size (MB of float32 coordinates + density) are sent to the browser once and sliced there,
+# bigger ones are sliced on the server. 0 always slices on the server
+CLIENT_MEMORY_BUDGET = float(os.environ.get("MALAWEB_CLIENT_MEMORY_BUDGET", 128))
+# Points along the longest axis of the Cartesian grid the density is resampled to in volume/isosurface mode
+VOLUME_RESOLUTION = int(os.environ.get("MALAWEB_VOLUME_RESOLUTION", 32))
+# Number of isosurfaces a volume is drawn with
+VOLUME_SURFACES = 12
+# plotly trace type of the density for each render mode (settings "mode")
+RENDER_TRACE_TYPES = {"scatter": "scatter3d", "volume": "volume", "isosurface": "mesh3d", "orthoslice": "surface"}
+# figure traces of the a, b and c plane in orthoslice mode (traces 1-5 are the cell and atoms in every mode)
+ORTHO_TRACES = [0, 6, 7]
+# Number of triangles an isosurface mesh may have at most (bigger ones are decimated) and meshes kept in memory
+MESH_TRIANGLES = int(os.environ.get("MALAWEB_MESH_TRIANGLES", 100_000))
+MESH_CACHE_SIZE = int(os.environ.get("MALAWEB_MESH_CACHE_SIZE", 32))
+# Pixels along the longer side of the lattice plane images
+PLANE_RESOLUTION = int(os.environ.get("MALAWEB_PLANE_RESOLUTION", 256))
+# Number of density points the scatter-plot shows at most - bigger (slices of) grids are shown at a coarser level
+POINT_BUDGET = int(os.environ.get("MALAWEB_POINT_BUDGET", 200_000))
+# Run inferences of supercells (exact repetitions of a smaller cell) on the smaller cell and tile the result
+REDUCE_SUPERCELLS = os.environ.get("MALAWEB_REDUCE_SUPERCELLS", "1") == "1"
+# Number of atoms the preview of an upload shows at most - bigger structures are shown as an evenly spread sample
+PREVIEW_ATOMS = int(os.environ.get("MALAWEB_PREVIEW_ATOMS", 5000))
+# Copies of the cell the plot may show along each lattice vector (the repeated cells share the point budget)
+MAX_REPEAT = settings.MAX_REPEAT
+# Minimum time (ms) between two slicing requests a browser sends to the server while a slider is dragged
+SLICE_THROTTLE = int(os.environ.get("MALAWEB_SLICE_THROTTLE", 100))
 
 # TODO: implement patching so that figures are updated, not recreated
 # as in: https://dash.plotly.com/partial-properties
@@ -105,6 +174,42 @@ du.configure_upload(app, r"./session", http_request_handler=None)
 # for publicly hosting this app, add http_request_handler=True and implement as in:
 # https://github.com/np-8/dash-uploader/blob/dev/docs/dash-uploader.md
 
+# Inference results live on the server, df_store only holds a handle to them
+DATASETS = DatasetCache(r"./session")
+# Uploaded atoms as well, UP_STORE only holds a handle and summary (see AtomsStore.put)
+ATOMS = AtomsStore(r"./session")
+
+# Inferences run in worker processes, each keeping its models warm
+JOBS = JobQueue(r"./session", workers=INFERENCE_WORKERS, initializer=init_worker)
+if PRELOAD_MODELS:
+    # start the workers now, so they load the models on startup
+    JOBS.start()
+
+# Results of previous inferences, keyed by a hash of atoms, model and temperature
+RESULTS = ResultCache(r"./session/cache", max_bytes=RESULT_CACHE_SIZE * 1024**2)
+
+# Estimates run time and memory of inferences from past runs, jobs are only submitted if they fit the budget
+ESTIMATOR = CostEstimator(r"./session/cost_log.jsonl")
+ADMISSION = AdmissionController(
+    JOBS, memory_budget=INFERENCE_MEMORY_BUDGET * 1024**2, max_time=MAX_INFERENCE_TIME
+)
+
+# Only the latest slicing request of a session is computed, superseded ones are dropped
+SLICE_REQUESTS = RequestCoalescer()
+
+# Isosurface meshes by (session ID, dataset version, isovalue), so scrubbing over isovalues doesn't recompute them
+MESHES = MeshCache(max_entries=MESH_CACHE_SIZE)
+# frames of the latest upload per session (upload ID), indexed in the background
+FRAMES = {}
+# batch jobs reading frames of an uploaded file per file, a replaced upload is only deleted once they finished
+FRAME_READERS = {}
+# replaced (or reset) uploads batch jobs still read frames from, deleted by release_uploads
+STALE_UPLOADS = set()
+# jobs reading a kept LDOS (total energy, other temperatures, sweeps) per LDOS file, deleted once they finished
+LDOS_READERS = {}
+# LDOS files superseded by a newer inference while still being read, deleted by release_ldos
+STALE_LDOS = set()
+
 
 # ---------------------------------
 # Plots for the created Figures
@@ -142,6 +247,15 @@ p_layout_landing = dbc.Container(
         ),  # determines what is rendered as main content (among other things?)
         dcc.Store(id="UP_STORE"),  # Info on uploaded file (path, ...)
         dcc.Store(id="BOUNDARIES_STORE"),  # Saving data for cell-boundaries
+        dcc.Store(id="slice_throttle", data=SLICE_THROTTLE),  # ms between slicing requests to the server
+        # the total energy is computed after the inference (see start_total_energy)
+        dcc.Store(id="total_energy_job"),
+        dcc.Store(id="total_energy"),  # VERSION of the dataset and its total energy, once computed
+        dcc.Interval(id="total-energy-poll", interval=2000, disabled=True),
+        # batch inference of trajectory frames (see submit_batch)
+        dcc.Store(id="batch_jobs"),
+        dcc.Store(id="batch_energies"),
+        dcc.Interval(id="batch-poll", interval=2000, disabled=True),
         dcc.Store(
             id="plot_settings"
         ),  # parameters of the righthand sidebar, used to update plot
@@ -165,12 +279,18 @@ app.layout = p_layout_landing
     Output("UP_STORE", "data", allow_duplicate=True),
     Output("download-data", "disabled", allow_duplicate=True),
     Input("reset-data", "n_clicks"),
+    State("UP_STORE", "data"),
     prevent_initial_call=True,
 )
-def click_reset(click):
+def click_reset(click, up_data):
     """
     Resets the app to its initial state on reset button click (menu)
     """
+    if up_data is not None:
+        DATASETS.drop(up_data["ID"])
+        ATOMS.drop(up_data["ID"])
+        SLICE_REQUESTS.forget(up_data["ID"])
+        forget_frames(up_data["ID"])
     return "landing", None, False, False, None, True
 
 
@@ -263,6 +383,24 @@ def toggle_tools(n_sc_s, is_open):
         return not is_open
 
 
+@app.callback(
+    Output("plane-collapse", "is_open"),
+    Output("scatter-plot", "style"),
+    Input("open-plane", "n_clicks"),
+    State("plane-collapse", "is_open"),
+    prevent_initial_call=True,
+)
+def toggle_plane(n_clicks, is_open):
+    """
+    opens/collapses the plane view next to the plot, the plot shrinks to make room for it
+    """
+    if n_clicks:
+        if is_open:
+            return False, main.plot_layout
+        return True, dict(main.plot_layout, width="60vw")
+    raise PreventUpdate
+
+
 @app.callback(
     Output("slice-x", "active", allow_duplicate=True),
     Input("slice-x", "n_clicks"),
@@ -385,10 +523,13 @@ def reset_sliders(n_clicks_x, n_clicks_y, n_clicks_z, n_clicks_dense, data):
     """
     resets the sliders to their initial state on reset-button click
     """
-    df = pd.DataFrame(data["MALA_DF"]["scatter"])
+    dataset = DATASETS.get(data)
+    if dataset is None:
+        raise PreventUpdate
+    nx, ny, nz = dataset["density"].shape
     if dash.callback_context.triggered_id == "reset-slider-x":
         return (
-            [0, len(np.unique(df["x"])) - 1],
+            [0, nx - 1],
             dash.no_update,
             dash.no_update,
             dash.no_update,
@@ -396,7 +537,7 @@ def reset_sliders(n_clicks_x, n_clicks_y, n_clicks_z, n_clicks_dense, data):
     elif dash.callback_context.triggered_id == "reset-slider-y":
         return (
             dash.no_update,
-            [0, len(np.unique(df["y"])) - 1],
+            [0, ny - 1],
             dash.no_update,
             dash.no_update,
         )
@@ -404,7 +545,7 @@ def reset_sliders(n_clicks_x, n_clicks_y, n_clicks_z, n_clicks_dense, data):
         return (
             dash.no_update,
             dash.no_update,
-            [0, len(np.unique(df["z"])) - 1],
+            [0, nz - 1],
             dash.no_update,
         )
     elif dash.callback_context.triggered_id == "reset-slider-val":
@@ -412,7 +553,7 @@ def reset_sliders(n_clicks_x, n_clicks_y, n_clicks_z, n_clicks_dense, data):
             dash.no_update,
             dash.no_update,
             dash.no_update,
-            [0, len(np.unique(df["val"])) - 1],
+            [0, len(dataset["value_steps"]) - 1],
         )
     else:
         raise PreventUpdate
@@ -476,7 +617,6 @@ def store_cam(default_clicks, x_y_clicks, x_z_clicks, y_z_clicks, user_in):
 
 
 # page state
-# TODO this should be optimized to not transfer the all the data everytime
 @app.callback(
     Output("page_state", "data"),
     Input("df_store", "data"),
@@ -504,11 +644,12 @@ def update_page_state(trig1, state):
     output=[
         Output("output-session-state", "children"),
         Output("UP_STORE", "data"),
-        Output("atom-limit-warning", "is_open"),
-        Output("atoms_list", "children"),
+        Output("atoms_list", "page_current"),
         Output("atoms-preview", "figure"),
         Output("session-data", "className"),
         Output("BOUNDARIES_STORE", "data"),
+        Output("frame-index-poll", "disabled"),
+        Output("frame-choice", "value"),
     ],
     id="session-data",
 )
@@ -520,195 +661,398 @@ def upload_callback(status):  # <------- NEW: du.UploadStatus
     Output
     session-state: Upload-state below session-area;
     UP_STORE: dcc.Store-component, storing uploader-ID and path of uploaded file;
-    atom-limit-warning: Boolean for displaying long-computation-time-warning;
-    atoms_list: Table containing all atoms read by ASE;
+    atoms_list: Table of all atoms read by ASE, back to its first page (rows are served by update_atoms_table);
     atoms-preview: Figure previewing ASE-read Atoms;
     session-data: Changing border-color of this component according to session-status;
+    frame-index-poll: polls the indexing of further frames (see update_frame_count);
+    frame-choice: the first frame is shown;
     """
     UP_STORE = {
         "ID": status.upload_id,
         "PATH": str(status.latest_file.resolve()),
         "ATOMS": None,
     }
-    LIMIT_EXCEEDED = False
     fig = px.scatter_3d()
     fig.update_layout(templ2["layout"])
     boundaries = []
     # ASE.reading to check for file-format support, to fill atoms_table, and to fill atoms-preview
     try:
-        r_atoms = ase.io.read(status.latest_file)
+        # only the first frame is read here, the rest of the file is indexed in the background (FrameIndex)
+        r_atoms = ase.io.read(status.latest_file, index=0)
         UPDATE_TEXT = "Upload successful"
-        UP_STORE["ATOMS"] = r_atoms.todict()
-        # delete uploaded file right after it's read by ASE - could be problematic, will see
-        # TODO: delete session path either right here, or when session ends (how?)
-        Path(str(status.latest_file.resolve())).unlink()
-
-        if r_atoms.get_global_number_of_atoms() > ATOM_LIMIT:
-            LIMIT_EXCEEDED = True
-        table_rows = [
-            html.Tr(
-                [html.Td(atom.index), html.Td(atom.x), html.Td(atom.y), html.Td(atom.z)]
-            )  # , html.Td("checkbox")
-            for atom in r_atoms
-        ]
-
-        atoms_fig = go.Scatter3d(
-            name="Atoms",
-            x=[atom.x for atom in r_atoms],
-            y=[atom.y for atom in r_atoms],
-            z=[atom.z for atom in r_atoms],
-            mode="markers",
-            hovertemplate="X: %{x}</br></br>Y: %{y}</br>Z: %{z}<extra></extra>",
-        )
-
-        # Draw the outline of 4 planes and add them as individual traces
-        # (2 / 6 Planes will be obvious by the 4 surrounding them)
-        X_axis = r_atoms.cell[0]
-        Y_axis = r_atoms.cell[1]
-        Z_axis = r_atoms.cell[2]
-
-        # Plane 1: X-Z-1
-        x_points = [0, X_axis[0], X_axis[0] + Z_axis[0], Z_axis[0], 0]
-        y_points = [0, X_axis[1], X_axis[1] + Z_axis[1], Z_axis[1], 0]
-        z_points = [0, X_axis[2], X_axis[2] + Z_axis[2], Z_axis[2], 0]
-        fig.add_trace(
-            go.Scatter3d(
-                x=x_points,
-                y=y_points,
-                z=z_points,
-                hoverinfo="skip",
-                mode="lines",
-                marker={"color": "black"},
-                name="Cell",
-            )
-        )
-        boundary1 = go.Scatter3d(
-            name="cell",
-            x=x_points,
-            y=y_points,
-            z=z_points,
-            hoverinfo="skip",
-            mode="lines",
-            marker={"color": "black"},
-        )
-        # Plane 2: X-Z-2
-        x_points = [
-            0 + Y_axis[0],
-            X_axis[0] + Y_axis[0],
-            X_axis[0] + Z_axis[0] + Y_axis[0],
-            Z_axis[0] + Y_axis[0],
-            0 + Y_axis[0],
-        ]
-        y_points = [
-            0 + Y_axis[1],
-            X_axis[1] + Y_axis[1],
-            X_axis[1] + Z_axis[1] + Y_axis[1],
-            Z_axis[1] + Y_axis[1],
-            0 + Y_axis[1],
-        ]
-        z_points = [0, X_axis[2], X_axis[2] + Z_axis[2], Z_axis[2], 0]
-        fig.add_trace(
-            go.Scatter3d(
-                x=x_points,
-                y=y_points,
-                z=z_points,
-                hoverinfo="skip",
-                mode="lines",
-                marker={"color": "black"},
-                showlegend=False,
-            )
-        )
-        boundary2 = go.Scatter3d(
-            name="cell",
-            x=x_points,
-            y=y_points,
-            z=z_points,
-            hoverinfo="skip",
-            mode="lines",
-            marker={"color": "black"},
-            showlegend=False,
-        )
-
-        # Plane 3: X-Y-1
-        x_points = [0, X_axis[0], X_axis[0] + Y_axis[0], Y_axis[0], 0]
-        y_points = [0, X_axis[1], X_axis[1] + Y_axis[1], Y_axis[1], 0]
-        z_points = [0, X_axis[2], X_axis[2] + Y_axis[2], Y_axis[2], 0]
-        fig.add_trace(
-            go.Scatter3d(
-                x=x_points,
-                y=y_points,
-                z=z_points,
-                hoverinfo="skip",
-                mode="lines",
-                marker={"color": "black"},
-                showlegend=False,
-            )
-        )
-        boundary3 = go.Scatter3d(
-            name="cell",
-            x=x_points,
-            y=y_points,
-            z=z_points,
-            hoverinfo="skip",
-            mode="lines",
-            marker={"color": "black"},
-            showlegend=False,
-        )
-        # Plane 4: X-Y-2
-        x_points = [0, X_axis[0], X_axis[0] + Y_axis[0], Y_axis[0], 0]
-        y_points = [0, X_axis[1], X_axis[1] + Y_axis[1], Y_axis[1], 0]
-        z_points = [
-            0 + Z_axis[2],
-            X_axis[2] + Z_axis[2],
-            X_axis[2] + Y_axis[2] + Z_axis[2],
-            Y_axis[2] + Z_axis[2],
-            0 + Z_axis[2],
-        ]
-        fig.add_trace(
-            go.Scatter3d(
-                x=x_points,
-                y=y_points,
-                z=z_points,
-                hoverinfo="skip",
-                mode="lines",
-                marker={"color": "black"},
-                showlegend=False,
-            )
-        )
-        boundary4 = go.Scatter3d(
-            name="cell",
-            x=x_points,
-            y=y_points,
-            z=z_points,
-            hoverinfo="skip",
-            mode="lines",
-            marker={"color": "black"},
-            showlegend=False,
-        )
+        UP_STORE["ATOMS"] = ATOMS.put(status.upload_id, r_atoms)
+        UP_STORE["FRAME"] = 0
+        UP_STORE["REPEAT"] = supercell_repeat(r_atoms)
+        # the uploaded file is kept, frames are read from it on demand (the previous upload's file is deleted)
+        forget_frames(status.upload_id, keep=status.latest_file)
+        FRAMES[status.upload_id] = FrameIndex(status.latest_file).start()
 
-        boundaries = [boundary1, boundary2, boundary3, boundary4]
-        fig.update_scenes(removeHoverLines)
-        fig.add_trace(atoms_fig)
+        table_page = 0
+        fig, boundaries = atoms_preview(r_atoms)
 
         border_style = "session-success"
 
     # ValueError or File not sup. - exception for not supported formats (not yet filtered by session-component)
     except ValueError:
-        r_atoms, UPDATE_TEXT, UP_STORE, table_rows, border_style = upload_exception()
+        r_atoms, UPDATE_TEXT, UP_STORE, table_page, border_style = upload_exception()
     except ase.io.formats.UnknownFileTypeError:
-        r_atoms, UPDATE_TEXT, UP_STORE, table_rows, border_style = upload_exception()
+        r_atoms, UPDATE_TEXT, UP_STORE, table_page, border_style = upload_exception()
         # = FILE NOT SUPPORTED AS ASE INPUT
         # (some formats listed in supported-files for ase are output only. This will only be filtered here)
 
     return (
         UPDATE_TEXT,
         UP_STORE,
-        LIMIT_EXCEEDED,
-        table_rows,
+        table_page,
         go.Figure(fig),
         border_style,
         boundaries,
+        border_style != "session-success",
+        0,
+    )
+
+
+def forget_frames(upload_id, keep=None):
+    """
+    Drops the frame index of a session's upload and deletes the uploaded file (unless it is keep, f.e. re-uploaded)
+    """
+    index = FRAMES.pop(upload_id, None)
+    if index is not None and (keep is None or Path(index.path).resolve() != Path(keep).resolve()):
+        # an indexing thread still reading it keeps its open file, queued batch jobs don't (see release_uploads)
+        STALE_UPLOADS.add(str(Path(index.path).resolve()))
+    release_uploads()
+
+
+def release_uploads():
+    """
+    Deletes the replaced uploads no queued or running batch job reads frames from any more
+    """
+    current = {str(Path(index.path).resolve()) for index in list(FRAMES.values())}
+    for path in list(STALE_UPLOADS):
+        if path in current:
+            # uploaded again
+            STALE_UPLOADS.discard(path)
+        elif not has_pending_readers(FRAME_READERS, path):
+            Path(path).unlink(missing_ok=True)
+            STALE_UPLOADS.discard(path)
+
+
+def has_pending_readers(readers, path):
+    """
+    True while one of the jobs noted in readers (path -> jobs reading it) for a file is queued or running
+    """
+    pending = [job for job in readers.pop(str(path), []) if JOBS.status(job) in ["queued", "running"]]
+    if pending:
+        readers[str(path)] = pending
+    return bool(pending)
+
+
+def atoms_preview(r_atoms):
+    """
+    Preview figure and cell boundaries (traces for the main plot) of uploaded atoms.
+    Above PREVIEW_ATOMS atoms, the preview shows a sample spread evenly over the cell
+    """
+    positions = r_atoms.get_positions().astype(np.float32)
+    # sampled within the bounding box of the atoms (files without a cell have none to sample in)
+    shown = np.arange(len(positions))
+    if len(positions) > 0:
+        extent = np.ptp(positions, axis=0)
+        shown = stratified_sample((positions - positions.min(axis=0)) / np.where(extent > 0, extent, 1), PREVIEW_ATOMS)
+    name = "Atoms" if len(shown) == len(positions) else f"Atoms ({len(shown)} of {len(positions)})"
+    atoms_fig = go.Scatter3d(
+        name=name,
+        x=positions[shown, 0],
+        y=positions[shown, 1],
+        z=positions[shown, 2],
+        customdata=shown,
+        mode="markers",
+        hovertemplate="ID: %{customdata}</br></br>X: %{x}</br>Y: %{y}</br>Z: %{z}<extra></extra>",
+    )
+    # the 4 plane outlines (2 / 6 Planes will be obvious by the 4 surrounding them) as one trace
+    outline = cell_outline(r_atoms.cell)
+    cell_fig = go.Scatter3d(
+        x=outline[:, 0],
+        y=outline[:, 1],
+        z=outline[:, 2],
+        hoverinfo="skip",
+        mode="lines",
+        marker={"color": "black"},
+        name="Cell",
+    )
+    fig = go.Figure([cell_fig, atoms_fig], layout=templ2["layout"])
+
+    # the main plot keeps them as individual traces (traces 1-4, see update_plot)
+    boundaries = []
+    for i, plane in enumerate(cell_planes(r_atoms.cell)):
+        boundaries.append(
+            go.Scatter3d(
+                name="cell",
+                x=plane[:, 0],
+                y=plane[:, 1],
+                z=plane[:, 2],
+                hoverinfo="skip",
+                mode="lines",
+                marker={"color": "black"},
+                showlegend=i == 0,
+            )
+        )
+    fig.update_scenes(removeHoverLines)
+    return fig, boundaries
+
+
+@app.callback(
+    Output("atoms_list", "data"),
+    Output("atoms_list", "page_count"),
+    Input("atoms_list", "page_current"),
+    Input("atoms_list", "page_size"),
+    Input("atoms_list", "sort_by"),
+    Input("atoms_list", "filter_query"),
+    Input("UP_STORE", "data"),
+)
+def update_atoms_table(page, page_size, sort_by, filter_query, upload):
+    """
+    The current page of the atoms table, filtered and sorted on the server from the stored atoms
+    """
+    if upload is None or upload.get("ATOMS") is None:
+        return [], 1
+    columns = atom_columns(uploaded_atoms(upload))
+    try:
+        return atoms_page(columns, page or 0, page_size, sort_by, filter_query)
+    except (KeyError, ValueError):
+        # filters the table can't apply (f.e. text on a number column) show no rows
+        return [], 1
+
+
+@app.callback(
+    Output("frame-count", "children"),
+    Output("frame-choice", "max"),
+    Output("frame-index-poll", "disabled", allow_duplicate=True),
+    Input("frame-index-poll", "n_intervals"),
+    State("UP_STORE", "data"),
+    prevent_initial_call=True,
+)
+def update_frame_count(n_intervals, upload):
+    """
+    Shows how many frames of the uploaded file are indexed so far, until the whole file is
+    """
+    if upload is None or upload["ID"] not in FRAMES:
+        return "of 1", 0, True
+    index = FRAMES[upload["ID"]]
+    if not index.done:
+        return f"of {len(index)}+ (indexing)", max(0, len(index) - 1), False
+    text = f"of {len(index)}" if index.error is None else f"of {len(index)} (rest unreadable)"
+    return text, max(0, len(index) - 1), True
+
+
+@app.callback(
+    Output("UP_STORE", "data", allow_duplicate=True),
+    Output("atoms_list", "page_current", allow_duplicate=True),
+    Output("atoms-preview", "figure", allow_duplicate=True),
+    Output("BOUNDARIES_STORE", "data", allow_duplicate=True),
+    Input("frame-choice", "value"),
+    State("UP_STORE", "data"),
+    prevent_initial_call=True,
+)
+def select_frame(frame, upload):
+    """
+    Reads the chosen frame of the uploaded file, which MALA then runs on
+    """
+    if frame is None or upload is None or upload["ATOMS"] is None or frame == upload.get("FRAME", 0):
+        raise PreventUpdate
+    index = FRAMES.get(upload["ID"])
+    if index is None or not 0 <= frame < len(index):
+        raise PreventUpdate
+    r_atoms = index.frame(int(frame))
+    upload = dict(upload, ATOMS=ATOMS.put(upload["ID"], r_atoms), FRAME=int(frame), REPEAT=supercell_repeat(r_atoms))
+    fig, boundaries = atoms_preview(r_atoms)
+    return upload, 0, go.Figure(fig), boundaries
+
+
+def parse_frames(text, count):
+    """
+    Frame numbers of a batch, given as "start:stop:step" (stop included) or as comma separated list, all if empty
+    """
+    if not text:
+        return list(range(count))
+    if ":" in text:
+        start, stop, step = (int(part) for part in text.split(":"))
+        if step <= 0:
+            raise ValueError("step must be positive")
+        frames = range(start, stop + 1, step)
+    else:
+        frames = [int(part) for part in text.split(",") if part.strip()]
+    return [frame for frame in frames if 0 <= frame < count]
+
+
+@app.callback(
+    Output("batch_jobs", "data"),
+    Output("batch_energies", "data"),
+    Output("batch-poll", "disabled"),
+    Output("batch-status", "children"),
+    Input("run-batch", "n_clicks"),
+    State("batch-frames", "value"),
+    State("model-choice", "value"),
+    State("model-temp", "value"),
+    State("UP_STORE", "data"),
+    prevent_initial_call=True,
+)
+def submit_batch(click, frames_text, model_choice, temp_choice, upload):
+    """
+    Runs MALA on many frames of the uploaded trajectory: one job per frame, dispatched to the inference workers
+    (which keep their predictor loaded) as the budget allows. The jobs read their frame and skip frames with a
+    complete cached result (see batch.run_frame); they compute the total energy right away, so every frame
+    is cached complete (no LDOS is kept per frame).
+    """
+    if upload is None or model_choice is None or temp_choice is None or upload["ID"] not in FRAMES:
+        raise PreventUpdate
+    index = FRAMES[upload["ID"]]
+    try:
+        frames = parse_frames(frames_text, len(index))
+    except ValueError:
+        return None, None, True, "Frames: start:stop:step or a comma separated list"
+    if not 0 < len(frames) <= MAX_BATCH_FRAMES:
+        return None, None, True, f"Between 1 and {MAX_BATCH_FRAMES} frames (of {len(index)} indexed so far)"
+
+    model_temp_path = {"name": model_choice, "temperature": float(temp_choice)}
+    # estimated from the index, without reading the frames: for the whole frame, an upper bound for supercells
+    # every frame is decided on before the first job is submitted, so a rejected frame leaves no jobs behind
+    estimates = []
+    for frame in frames:
+        estimate = ESTIMATOR.estimate(model_choice, index.n_atoms[frame], index.volume(frame))
+        if ADMISSION.decide(estimate) == "reject":
+            return None, None, True, f"Frame {frame}: " + format_estimate(estimate) + " exceeds the server's budget"
+        estimates.append(estimate)
+
+    jobs = []
+    for frame, estimate in zip(frames, estimates):
+        job = ADMISSION.submit(
+            upload["ID"],
+            run_frame,
+            dict(
+                locator=index.locator(frame),
+                model_and_temp=model_temp_path,
+                session_id=upload["ID"],
+                results_root=str(RESULTS.root),
+                reduce_supercells=REDUCE_SUPERCELLS,
+            ),
+            estimate,
+        )
+        job.update(FRAME=frame, MODEL=model_choice)
+        jobs.append(job)
+    # the upload is kept until these jobs read their frames (see forget_frames)
+    FRAME_READERS.setdefault(str(Path(index.path).resolve()), []).extend(jobs)
+    return jobs, [], False, f"Batch: 0 of {len(frames)} frames done"
+
+
+def frame_energies(frame, energies, repeat):
+    """
+    Energies of one frame of a batch for the footer chart (of the whole frame, for supercells)
+    """
+    copies = int(np.prod(repeat))
+    return {
+        "frame": frame,
+        "band_energy": float(energies["band_energy"]) * copies,
+        "fermi_energy": float(energies["fermi_energy"]),
+    }
+
+
+@app.callback(
+    Output("batch_jobs", "data", allow_duplicate=True),
+    Output("batch_energies", "data", allow_duplicate=True),
+    Output("batch-poll", "disabled", allow_duplicate=True),
+    Output("batch-status", "children", allow_duplicate=True),
+    Input("batch-poll", "n_intervals"),
+    State("batch_jobs", "data"),
+    State("batch_energies", "data"),
+    prevent_initial_call=True,
+)
+def collect_batch(n_intervals, jobs, energies):
+    """
+    Picks up the frames of a batch as they finish: their results go to the result cache (so the frame shows
+    instantly when run on its own), their energies to the footer chart
+    """
+    if not jobs:
+        raise PreventUpdate
+    pending, failed = [], 0
+    for job in jobs:
+        status = JOBS.status(job)
+        if status in ["queued", "running"]:
+            pending.append(job)
+            continue
+        try:
+            result = JOBS.result(job)
+        except (RuntimeError, FileNotFoundError) as error:
+            print(error)
+            failed += 1
+            continue
+        stats = JOBS.stats(job)
+        # predicted, not taken from the cache
+        if result["results"] is not None:
+            # the only inferences with total energy: they calibrate the estimates of batch frames
+            if stats is not None:
+                ESTIMATOR.record(
+                    job["MODEL"],
+                    result["n_atoms"],
+                    result["volume"],
+                    np.prod(result["results"]["grid_dimensions"]),
+                    stats["time"],
+                    stats["memory"],
+                    calc_total_energy=True,
+                )
+            RESULTS.put(result["key"], result["results"])
+        energies.append(frame_energies(job["FRAME"], result["energies"], result["repeat"]))
+    if len(pending) == len(jobs):
+        raise PreventUpdate
+    release_uploads()
+    status = f"Batch: {len(energies)} of {len(energies) + len(pending)} frames done"
+    if failed:
+        status += f", {failed} failed"
+    return pending, energies, not pending, status
+
+
+@app.callback(
+    Output("batch-plot", "figure"),
+    Input("batch_energies", "data"),
+    prevent_initial_call=True,
+)
+def update_batch_plot(energies):
+    """
+    Band and Fermi energy per frame of the batch
+    """
+    if not energies:
+        raise PreventUpdate
+    energies = sorted(energies, key=lambda energy: energy["frame"])
+    frames = [energy["frame"] for energy in energies]
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=frames,
+            y=[energy["band_energy"] for energy in energies],
+            name="Band energy",
+            mode="lines+markers",
+            line=dict(color="#f15e64", width=2),
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=frames,
+            y=[energy["fermi_energy"] for energy in energies],
+            name="Fermi energy",
+            yaxis="y2",
+            line=dict(color="#5e8ef1", width=2, dash="dot"),
+        )
     )
+    fig.update_layout(
+        margin=dict(l=0, r=0, b=0, t=0),
+        showlegend=False,
+        paper_bgcolor="#f8f9fa",
+        plot_bgcolor="#f8f9fa",
+        xaxis={"gridcolor": "#D3D3D3", "linecolor": "black", "title": None},
+        yaxis={"gridcolor": "#D3D3D3", "linecolor": "black"},
+        yaxis2={"overlaying": "y", "side": "right", "showgrid": False},
+        hovermode="x unified",
+    )
+    return fig
 
 
 # END DASH UPLOADER
@@ -889,39 +1233,41 @@ def init_temp_choice(model_choice):
 # (indirectly) Opens a popup, showing
 #   - the uploaded Atoms with a checkmark;
 #   - possibly giving a prerender of only the atoms;
-#   - giving a warning if more than (ATOM_LIMIT) Atoms are selected
+#   - giving the estimated run time and memory of the inference
 #   - has a "Start MALA" Button
-# !!  THIS IS RUNNING MALA INFERENCE  !!
-# AND "PARSING" DATA FOR CONTINUED USE
+# !!  THIS IS SUBMITTING THE MALA INFERENCE  !!
+# (it runs in a worker process, update_dataframes picks up the result)
 
 
 @app.callback(
-    Output("df_store", "data"),
-    Output("unique_df", "data"),
-    Output("download-data", "disabled"),
+    Output("inference_job", "data"),
+    Output("job-poll", "disabled", allow_duplicate=True),
+    Output("inference-status", "children", allow_duplicate=True),
+    Output("run-mala", "disabled", allow_duplicate=True),
     Input("run-mala", "n_clicks"),
     State("model-choice", "value"),
     State("model-temp", "value"),
     State("UP_STORE", "data"),
     prevent_initial_call=True,
 )
-def update_dataframes(trig, model_choice, temp_choice, upload):
+def submit_inference(trig, model_choice, temp_choice, upload):
     """
     Input
     :param trig: =INPUT - Pressing button "run-mala" triggers callback
     :param model_choice: =STATE - info on the cell-system (substance+temp(-range)), separated by |
     :param temp_choice: =STATE - chosen temperature - either defined by model-choice, or direct input inbetween range
-    :param upload: =STATE - dict(session ID, filepath, ASE-Atoms-Obj as dict)
-
-    :return: returns a dictionary with the data necessary to render to store-component
+    :param upload: =STATE - dict(session ID, filepath, handle of the uploaded atoms)
 
     Output
-    df_store[data]... variable where we store the info necessary to render, so that we can use it in other callbacks
+    inference_job[data]... handle of the queued inference job (or of the cached result)
+    job-poll[disabled]... enables polling for the result
+    inference-status[children]... progress info below the run-mala button
+    run-mala[disabled]... re-enabled if the inference is rejected
 
     NOW:
-    read file from dict stored in UP_STORE['ATOMS']
+    read atoms from the AtomsStore (handle in UP_STORE['ATOMS'])
     on MALA-call, give ATOMS-objs & model_choice
-    -> returns density data and energy values +  a .cube-file
+    -> queues the inference (if admitted), which returns density data and energy values
     """
     if upload is None:
         raise PreventUpdate
@@ -929,124 +1275,378 @@ def update_dataframes(trig, model_choice, temp_choice, upload):
 
     # ASE.reading to receive ATOMS-objs, to pass to MALA-inference
     # no ValueError Exception needed, bc this is done directly on session
-    read_atoms = ase.Atoms.fromdict(upload["ATOMS"])
+    # supercells are predicted on their smaller cell, update_dataframes tiles the result back (see inference_atoms)
+    read_atoms, repeat = inference_atoms(upload)
+
+    # same atoms, model and temperature as before? -> no need to run MALA again
+    cache_key = RESULTS.key(read_atoms, model_temp_path)
+    ldos_file = session_ldos_file(upload, read_atoms, model_choice)
+    # the LDOS of these atoms is the latest again
+    STALE_LDOS.discard(str(ldos_file))
+    if RESULTS.contains(cache_key) and not missing_total_energy(cache_key, model_choice, read_atoms, ldos_file):
+        job = {"ID": None, "SESSION": upload["ID"], "KEY": cache_key, "CACHED": True, "REPEAT": repeat,
+               "MODEL": model_choice, "TEMPERATURE": model_temp_path["temperature"]}
+        return job, True, "Loading cached result", dash.no_update
+
+    # temperature-ranged models keep their LDOS, other temperatures are derived from it without predicting again
+    if temperature_range(model_choice) is not None and ldos_file.exists():
+        job = JOBS.submit(
+            upload["ID"],
+            run_from_ldos,
+            dict(atoms_to_predict=read_atoms, model_and_temp=model_temp_path, ldos_file=str(ldos_file),
+                 calc_total_energy=False),
+        )
+        job.update(KEY=cache_key, MODEL=model_choice, TEMPERATURE=model_temp_path["temperature"],
+                   CALC_TOTAL_ENERGY=False, REPEAT=repeat, FROM_LDOS=True)
+        read_ldos(ldos_file, job)
+        return job, False, "Recomputing for the new temperature from the stored LDOS", dash.no_update
+
+    # does the inference fit into the machine's budget?
+    # (the total energy is computed afterwards by its own job, see start_total_energy)
+    estimate = estimate_inference(model_choice, read_atoms)
+    decision = ADMISSION.decide(estimate)
+    if decision == "reject":
+        return dash.no_update, True, "Rejected: " + format_estimate(estimate) + " exceeds the server's budget", False
+
+    # only the LDOS of the latest inference is kept per session (the ones queued or running jobs still read
+    # are deleted by release_ldos once they finished)
+    ldos_file.parent.mkdir(parents=True, exist_ok=True)
+    for old_file in ldos_file.parent.glob("*.npy"):
+        if old_file == ldos_file:
+            continue
+        if ldos_in_use(old_file):
+            STALE_LDOS.add(str(old_file))
+        else:
+            old_file.unlink()
+
+    # (a) GET DATA FROM MALA (/ inference script) - in the background
+    job = ADMISSION.submit(
+        upload["ID"],
+        run_mala_prediction,
+        dict(
+            atoms_to_predict=read_atoms,
+            model_and_temp=model_temp_path,
+            session_id=upload["ID"],
+            calc_total_energy=False,
+            ldos_file=str(ldos_file),
+        ),
+        estimate,
+    )
+    job.update(KEY=cache_key, MODEL=model_choice, TEMPERATURE=model_temp_path["temperature"],
+               CALC_TOTAL_ENERGY=False, REPEAT=repeat)
+    return job, False, "Inference queued", dash.no_update
 
-    # (a) GET DATA FROM MALA (/ inference script)
 
-    mala_data = run_mala_prediction(
-        atoms_to_predict=read_atoms,
-        model_and_temp=model_temp_path,
-        session_id=upload["ID"],
-    )
-    # contains 'band_energy', 'total_energy', 'density', 'density_of_states', 'energy_grid'
-    # mala_data is stored in df_store dict under key 'MALA_DATA'. (See declaration of df_store below for more info)
-    density = mala_data["density"]
+def temperature_range(model_choice):
+    """
+    [min, max] temperature of a temperature-ranged model (f.e. "Al|[100,933]"), None for other models
+    """
+    temp = model_choice.split("|")[1]
+    if "[" not in temp:
+        return None
+    return [float(t) for t in temp[1:-1].split(",")]
 
-    coord_arr = np.column_stack(
-        list(map(np.ravel, np.meshgrid(*map(np.arange, density.shape), indexing="ij")))
-        + [density.ravel()]
-    )
-    data0 = pd.DataFrame(
-        coord_arr, columns=["x", "y", "z", "val"]
-    )  # untransformed Dataset
 
-    atoms = [[], [], [], [], []]
+def session_ldos_file(upload, atoms, model_choice):
+    """
+    Path the LDOS of the latest inference is kept at (in the session folder), for the total energy
+    and - with temperature-ranged models - other temperatures
+    """
+    key = RESULTS.key(atoms, {"name": model_choice, "temperature": 0.0})
+    return Path("./session") / upload["ID"] / "ldos" / f"{key}.npy"
 
-    x_axis = [
-        mala_data["grid_dimensions"][0],
-        mala_data["voxel"][0][0],
-        mala_data["voxel"][0][1],
-        mala_data["voxel"][0][2],
-    ]
-    y_axis = [
-        mala_data["grid_dimensions"][1],
-        mala_data["voxel"][1][0],
-        mala_data["voxel"][1][1],
-        mala_data["voxel"][1][2],
-    ]
-    z_axis = [
-        mala_data["grid_dimensions"][2],
-        mala_data["voxel"][2][0],
-        mala_data["voxel"][2][1],
-        mala_data["voxel"][2][2],
-    ]
 
-    # READING ATOMPOSITIONS
-    for i in range(0, len(read_atoms)):
-        atoms[0].append(read_atoms[i].symbol)
-        atoms[1].append(read_atoms[i].charge)
-        atoms[2].append(read_atoms.get_positions()[i, 0])
-        atoms[3].append(read_atoms.get_positions()[i, 1])
-        atoms[4].append(read_atoms.get_positions()[i, 2])
-    atoms_data = pd.DataFrame(
-        data={
-            "x": atoms[2],
-            "y": atoms[3],
-            "z": atoms[4],
-            "ordinal": atoms[0],
-            "charge": atoms[1],
-        }
-    )
+def uploaded_atoms(upload):
+    """
+    The uploaded atoms (of the chosen frame), resolved from the handle in UP_STORE['ATOMS']
+    """
+    atoms = ATOMS.get(upload["ID"], upload["ATOMS"])
+    if atoms is None:
+        # reset, or the session folder was cleaned up
+        raise PreventUpdate
+    return atoms
 
-    # SCALING AND SHEARING SCATTER DF
-    # (b) SCALING to right voxel-size
-    # need to bring atompositions and density-voxels to the same scaling
-    data0["x"] *= x_axis[1]
-    data0["y"] *= y_axis[2]
-    data0["z"] *= z_axis[3]
-    data_sc = data0.copy()
 
-    # SHEARING für scatter_3d - linearcombination
-    data_sc.x += y_axis[1] * (data0.y / y_axis[2])
-    data_sc.x += z_axis[1] * (data0.z / z_axis[3])
+def inference_atoms(upload):
+    """
+    Atoms the inference runs on and the (n, m, k) repetition of them that makes up the uploaded structure
+    (the uploaded atoms and (1, 1, 1) unless they are a supercell, see supercell_repeat)
+    """
+    atoms = uploaded_atoms(upload)
+    repeat = list(upload["REPEAT"])
+    if repeat == [1, 1, 1]:
+        return atoms, repeat
+    return reduce_supercell(atoms, repeat), repeat
 
-    data_sc.y += x_axis[2] * (data0.x / x_axis[1])
-    data_sc.y += z_axis[2] * (data0.z / z_axis[3])
 
-    data_sc.z += y_axis[3] * (data0.y / y_axis[2])
-    data_sc.z += x_axis[3] * (data0.x / x_axis[1])
+def supercell_repeat(atoms):
+    """
+    (n, m, k) repetition of a smaller cell the atoms consist of, [1, 1, 1] unless REDUCE_SUPERCELLS is set -
+    detected once per upload (and frame) and kept in UP_STORE['REPEAT'], so callbacks don't search it again
+    """
+    return list(find_supercell(atoms)) if REDUCE_SUPERCELLS else [1, 1, 1]
 
-    unique_df = {
-        "x": data_sc.x.unique(),
-        "y": data_sc.y.unique(),
-        "z": data_sc.z.unique(),
-        "val": np.unique(density),
-    }
+
+def missing_total_energy(key, model_choice, atoms, ldos_file):
+    """
+    True if a cached result lacks the total energy while it could still be computed, but there is no LDOS to
+    compute it from (f.e. the total energy job of its inference never finished) - then the inference runs again
+    """
+    energies = RESULTS.energies(key)
+    if energies is None or not np.isnan(energies["total_energy"]) or ldos_file.exists():
+        return False
+    return ADMISSION.decide(estimate_total_energy(model_choice, atoms)) != "reject"
+
+
+def estimate_inference(model_choice, atoms):
+    """
+    Estimated cost of an inference, without total energy calculation (see CostEstimator.estimate)
+    """
+    return ESTIMATOR.estimate(model_choice, len(atoms), atoms.get_volume(), calc_total_energy=False)
+
+
+def estimate_total_energy(model_choice, atoms):
+    """
+    Estimated cost of computing the total energy of an inference afterwards, from its LDOS (see start_total_energy)
+    """
+    return ESTIMATOR.estimate(model_choice, len(atoms), atoms.get_volume(), kind="total_energy")
+
+
+def read_ldos(ldos_file, job):
+    """
+    Notes that a (queued) job reads a kept LDOS, so it isn't deleted before the job finished (see ldos_in_use)
+    """
+    LDOS_READERS.setdefault(str(ldos_file), []).append(job)
+
+
+def ldos_in_use(ldos_file):
+    """
+    True while a job that reads the LDOS (see read_ldos) is queued or running
+    """
+    return has_pending_readers(LDOS_READERS, ldos_file)
+
+
+def release_ldos(ldos_file, model_choice):
+    """
+    Deletes a kept LDOS once the total energy no longer needs it, unless the model derives other temperatures from it
+    (or a newer inference superseded it) - and unless other jobs still read it
+    """
+    stale = str(ldos_file) in STALE_LDOS
+    if (temperature_range(model_choice) is None or stale) and not ldos_in_use(ldos_file):
+        Path(ldos_file).unlink(missing_ok=True)
+        STALE_LDOS.discard(str(ldos_file))
+
+
+def format_repeat(repeat):
+    """
+    "2×2×2" for a repetition of cells
+    """
+    return "×".join(str(n) for n in repeat)
+
+
+def format_estimate(estimate):
+    """
+    Human-readable run time and memory of an estimate
+    """
+    minutes, seconds = divmod(int(estimate["time"]), 60)
+    return f"~{minutes}:{seconds:02d} min, ~{estimate['memory'] / 1024**3:.1f} GB"
+
+
+@app.callback(
+    Output("cost-estimate", "children"),
+    Output("cost-estimate", "color"),
+    Output("cost-estimate", "is_open"),
+    Input("model-choice", "value"),
+    Input("UP_STORE", "data"),
+    prevent_initial_call=True,
+)
+def update_cost_estimate(model_choice, upload):
+    """
+    Shows the estimated run time and peak memory of the inference for the chosen model,
+    and whether the server will run, queue or reject it (and skip the total energy computed after it)
+    """
+    if model_choice is None or upload is None or upload["ATOMS"] is None:
+        return None, "info", False
+    atoms, repeat = inference_atoms(upload)
+    estimate = estimate_inference(model_choice, atoms)
+    decision = ADMISSION.decide(estimate)
+
+    text = "Estimated inference: " + format_estimate(estimate)
+    if repeat != [1, 1, 1]:
+        text += f" (supercell of {format_repeat(repeat)} cells, only one cell is predicted)"
+    if estimate["calibrated"] == 0:
+        text += " (rough guess, no runs of this model recorded yet)"
+    if decision == "reject":
+        return text + ". This exceeds the server's budget and can't be run.", "danger", True
+    if ADMISSION.decide(estimate_total_energy(model_choice, atoms)) == "reject":
+        text += ". The total energy exceeds the server's budget and will be skipped"
+        color = "warning"
+    else:
+        text += ". The total energy follows in the background"
+        color = "info"
+    if decision == "queue":
+        return text + ". The server is busy, the inference will be queued.", color, True
+    return text + ".", color, True
+
+
+# AND "PARSING" DATA FOR CONTINUED USE
+@app.callback(
+    Output("df_store", "data"),
+    Output("unique_df", "data"),
+    Output("download-data", "disabled"),
+    Output("job-poll", "disabled"),
+    Output("inference-status", "children"),
+    Output("run-mala", "disabled", allow_duplicate=True),
+    Input("job-poll", "n_intervals"),
+    Input("inference_job", "data"),
+    State("UP_STORE", "data"),
+    prevent_initial_call=True,
+)
+def update_dataframes(n_intervals, job, upload):
+    """
+    Input
+    :param n_intervals: =INPUT - ticks of job-poll, while an inference is running
+    :param job: =INPUT - handle of the inference job (see submit_inference), a cached result is read right away
+    :param upload: =STATE - dict(session ID, filepath, handle of the uploaded atoms)
+
+    :return: returns the handle of the server-side dataset to store-component
+
+    Output
+    df_store[data]... handle (session ID, version) of the dataset in DATASETS, so that we can use it in other callbacks
+    job-poll[disabled]... stops polling once the job finished
+    inference-status[children]... progress info below the run-mala button
+    run-mala[disabled]... re-enabled if the inference failed
+
+    NOW:
+    wait for the inference job to finish
+    -> takes density data and energy values, prepares them for plotting
+    """
+    if job is None or upload is None:
+        raise PreventUpdate
+
+    if job.get("CACHED"):
+        mala_data = RESULTS.get(job["KEY"])
+        if mala_data is None:
+            return dash.no_update, dash.no_update, dash.no_update, True, "Cached result expired, please retry", False
+        return prepare_supercell_dataset(mala_data, upload, job)
+
+    status = JOBS.status(job)
+    if status in ["queued", "running"]:
+        elapsed = int(time.time() - job["SUBMITTED"])
+        return (
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            f"Inference {status} ({elapsed // 60}:{elapsed % 60:02d})",
+            dash.no_update,
+        )
+    elif status == "unknown":
+        return dash.no_update, dash.no_update, dash.no_update, True, "Inference job lost, please retry", False
+
+    try:
+        mala_data = JOBS.result(job)
+    except RuntimeError as error:
+        print(error)
+        return dash.no_update, dash.no_update, dash.no_update, True, "Inference failed", False
+
+    # calibrates future estimates
+    stats = JOBS.stats(job)
+    # derived from a stored LDOS: no inference to calibrate with
+    if stats is not None and not job.get("FROM_LDOS"):
+        atoms, _ = inference_atoms(upload)
+        ESTIMATOR.record(
+            job["MODEL"],
+            len(atoms),
+            atoms.get_volume(),
+            np.prod(mala_data["grid_dimensions"]),
+            stats["time"],
+            stats["memory"],
+            calc_total_energy=job["CALC_TOTAL_ENERGY"],
+        )
+    # the total energy (NaN until computed) is added to the cached result by update_total_energy
+    RESULTS.put(job["KEY"], mala_data)
+    return prepare_supercell_dataset(mala_data, upload, job)
+
+
+def prepare_supercell_dataset(mala_data, upload, job):
+    """
+    prepare_dataset for the uploaded structure: results of the smaller cell of a supercell are tiled first
+    (see inference_atoms), which is stated in the inference status
+    """
+    repeat = job.get("REPEAT", [1, 1, 1])
+    if repeat == [1, 1, 1]:
+        return prepare_dataset(mala_data, upload)
+    outputs = prepare_dataset(tile_result(mala_data, repeat), upload)
+    status = f"Supercell: predicted one cell, tiled {format_repeat(repeat)} (energies and DOS scaled by {np.prod(repeat)})"
+    return outputs[:4] + (status,) + outputs[5:]
+
+
+def prepare_dataset(mala_data, upload):
+    """
+    Prepares the results of an inference for plotting and stores them in DATASETS.
+    Returns the outputs of update_dataframes.
+    """
+    read_atoms = uploaded_atoms(upload)
+    # contains 'band_energy', 'total_energy', 'density', 'density_of_states', 'energy_grid'
+    # mala_data is kept in DATASETS. (See declaration of df_store below for more info)
+    density = mala_data["density"]
 
     """
            Importing Data 
-               Parameters imported from:
-               (a) inference script:
+               Parameters imported from the inference script:
                    - bandEn
                    - totalEn
                    - density
                    - density of states - dOs
                    - energy Grid - enGrid
+                   - voxel: the 3 vectors spanning one grid cell, one per row
 
-               (b) .cube file created by running inference script
-                   =   axis-data -> x_, y_ and z_axis
-                   - voxel"resolution"
-                       - f.e. x_axis[0]
-                   - unit-vector
-                       - f.e. ( x_axis[1] / x_axis[2] / x_axis[3] ) is x-axis unit-vector
-               TODO: find a GOOD way to transform our data from kartesian grid to the according (in example data sheared) one
-                   - so far only doing that with a linear combination for dataframe in scatter_3d format
-                   - need to to this for volume too
-                   --> good way would be a matrix multiplication of some sort
+               The (in example data sheared) grid is mapped to cartesian coordinates
+               by one matrix product of the grid indices with the voxel vectors (see utils.geometry)
     """
+    # (b) SCALING AND SHEARING - cartesian coordinate of every grid point
+    coords = grid_coordinates(density.shape, mala_data["voxel"])
+
+    # sorted once, so the density slider works on a bounded number of steps without re-sorting on every tick
+    value_index = build_value_index(density, VALUE_STEPS, VALUE_SLIDER_MODE)
+
+    # x/y/z sliders select grid layers along the lattice axes, labeled with their fractional coordinate
+    # the density slider selects steps, labeled with their value and the number of points up to them
+    unique_df = {
+        "x": fractional_axis(density.shape[0]),
+        "y": fractional_axis(density.shape[1]),
+        "z": fractional_axis(density.shape[2]),
+        "val": value_index["value_steps"],
+        "val_below": value_index["value_below"],
+        "val_upto": value_index["value_upto"],
+    }
+    if BINARY_ENCODING:
+        unique_df = encode_columns(unique_df)
 
     # _______________________________________________________________________________________
 
-    df_store = {
-        "MALA_DF": {
-            "default": data0.to_dict("records"),
-            "scatter": data_sc.to_dict("records"),
+    # the arrays stay on the server, the browser only gets a handle (session ID + version)
+    df_store = DATASETS.put(
+        upload["ID"],
+        {
+            "density": density,
+            "coords": coords,
+            "atoms": read_atoms.get_positions(),
+            "voxel": np.asarray(mala_data["voxel"]),
+            "grid_dimensions": np.asarray(mala_data["grid_dimensions"]),
+            "band_energy": mala_data["band_energy"],
+            "total_energy": mala_data["total_energy"],
+            "fermi_energy": mala_data["fermi_energy"],
+            "density_of_states": np.asarray(mala_data["density_of_states"]),
+            "energy_grid": np.asarray(mala_data["energy_grid"]),
+            **value_index,
+            # block averaged levels, the plot shows the finest one that fits POINT_BUDGET
+            # (coarser ones for repeated cells, which share the budget, are added when shown - see extend_pyramid)
+            **build_pyramid(density, coords, POINT_BUDGET),
         },
-        "MALA_DATA": mala_data,
-        "INPUT_DF": atoms_data.to_dict("records"),
-        "SCALE": {"x_axis": x_axis, "y_axis": y_axis, "z_axis": z_axis},
-    }
-    return df_store, unique_df, False
+    )
+    return df_store, unique_df, False, True, None, dash.no_update
 
 
 # SETTINGS STORING
@@ -1058,16 +1658,26 @@ def update_dataframes(trig, model_choice, temp_choice, upload):
     Input("show-atoms", "value"),
     Input("opacity", "value"),
     Input("show-cell", "value"),
+    Input("render-mode", "value"),
+    Input("isovalue", "value"),
+    Input("repeat-a", "value"),
+    Input("repeat-b", "value"),
+    Input("repeat-c", "value"),
 )
-def update_settings_store(size, outline, atoms, opacity, cell):
+def update_settings_store(size, outline, atoms, opacity, cell, mode, isovalue, repeat_a, repeat_b, repeat_c):
     """
     Parameters
     ----------
     size
     outline
     atoms
-    opacity
+    opacity: of the points, volume, isosurface or orthoslice planes
     cell
+    mode: "scatter", "volume", "isosurface" or "orthoslice" (three lattice planes, moved by the ortho-a/b/c
+        sliders - their positions are not stored here, see move_orthoslice)
+    isovalue: fraction of the density range
+    repeat_a, repeat_b, repeat_c: copies of the cell along a, b and c (inputs of the "Repeat" section),
+        clamped to 1..MAX_REPEAT and stored as "repeat" [a, b, c]
 
     Returns
     -------
@@ -1087,6 +1697,9 @@ def update_settings_store(size, outline, atoms, opacity, cell):
             "outline": dict(width=1, color="DarkSlateGrey"),  # particle outline
             "atoms": True,
             "cell": 5,  # cell boundaries (width)
+            "mode": "scatter",  # render mode
+            "isovalue": 0.5,  # isosurface / lower bound of the volume, as fraction of the density range
+            "repeat": [1, 1, 1],  # copies of the cell along a, b and c
         }
         return plot_settings, True
 
@@ -1104,6 +1717,9 @@ def update_settings_store(size, outline, atoms, opacity, cell):
             # for disabling cell-boundaries, we just draw them thinly
         settings_patch["size"] = size
         settings_patch["opacity"] = opacity
+        settings_patch["mode"] = mode
+        settings_patch["isovalue"] = isovalue
+        settings_patch["repeat"] = [min(MAX_REPEAT, max(1, int(n or 1))) for n in (repeat_a, repeat_b, repeat_c)]
         if opacity is not None:
             if opacity < 1:
                 outline = False
@@ -1111,6 +1727,26 @@ def update_settings_store(size, outline, atoms, opacity, cell):
         return settings_patch, outline
 
 
+@app.callback(
+    Output("sz/isosurf-label", "children"),
+    Output("size-container", "style"),
+    Output("isovalue-container", "style"),
+    Output("ortho-container", "style"),
+    Input("render-mode", "value"),
+)
+def toggle_render_mode_controls(mode):
+    """
+    Shows the particle-size slider in scatter mode, the isovalue slider in volume/isosurface mode
+    and the plane sliders in orthoslice mode
+    """
+    hidden = {"marginLeft": "1.2em", "display": "none"}
+    if mode == "scatter":
+        return "Size", {"marginLeft": "1.2em"}, hidden, hidden
+    if mode == "orthoslice":
+        return "Planes", hidden, hidden, {}
+    return "Isovalue", hidden, {"marginLeft": "1.2em"}, hidden
+
+
 # EXPORT SETTINGS
 # TODO: include CAM-data
 @app.callback(
@@ -1224,6 +1860,7 @@ def update_tools(data, config_imported):
     if data is None:  # in case of reset:
         raise PreventUpdate
     else:
+        data = decode_columns(data)
         return (
             0,
             len(data["x"]) - 1,
@@ -1253,7 +1890,7 @@ def update_indicators_x(value, unique_data):
     if unique_data is None:  # in case of reset:
         raise PreventUpdate
 
-    u_data = np.array(unique_data["x"])
+    u_data = decode_columns(unique_data)["x"]
 
     if value is None:
         min_val = round(min(u_data), ndigits=5)
@@ -1278,7 +1915,7 @@ def update_indicators_y(value, unique_data):
     if unique_data is None:  # in case of reset:
         raise PreventUpdate
 
-    u_data = np.array(unique_data["y"])
+    u_data = decode_columns(unique_data)["y"]
 
     if value is None:
         min_val = round(min(u_data), ndigits=5)
@@ -1303,7 +1940,7 @@ def update_indicators_z(value, unique_data):
     if unique_data is None:  # in case of reset:
         raise PreventUpdate
 
-    u_data = np.array(unique_data["z"])
+    u_data = decode_columns(unique_data)["z"]
 
     if value is None:
         min_val = round(min(u_data), ndigits=5)
@@ -1328,16 +1965,19 @@ def update_indicators_dense(value, unique_data):
     if unique_data is None:  # in case of reset:
         raise PreventUpdate
 
-    u_data = np.array(unique_data["val"])
+    u_data = decode_columns(unique_data)
+    steps = u_data["val"]
 
     if value is None:
-        min_val = round(min(u_data), ndigits=5)
-        max_val = round(max(u_data), ndigits=5)
+        min_v, max_v = 0, len(steps) - 1
     else:
         min_v, max_v = value
-        min_val = round(u_data[min_v], ndigits=5)
-        max_val = round(u_data[max_v], ndigits=5)
-    return min_val, max_val
+    min_val = round(float(steps[min_v]), ndigits=5)
+    max_val = round(float(steps[max_v]), ndigits=5)
+    # share of grid points within the range, from the cumulative histogram of the value index
+    total = int(u_data["val_upto"][-1])
+    share = (int(u_data["val_upto"][max_v]) - int(u_data["val_below"][min_v])) / total
+    return min_val, f"{max_val} ({share:.1%} of points)"
 
 
 # LAYOUT CALLBACKS
@@ -1361,6 +2001,185 @@ def update_main_content(state, data):
         return main.plot
 
 
+def repeat_offsets(dataset, repeat):
+    """
+    Translations of the repeated cells (see geometry.tile_offsets) - the copies are only generated for display
+    """
+    cell = np.asarray(dataset["voxel"]) * np.array(dataset["density"].shape)[:, None]
+    return tile_offsets(cell, repeat)
+
+
+def volume_grid(dataset, repeat=None):
+    """
+    Density resampled onto a Cartesian grid (volume traces need axis-aligned grids, the cell may be sheared)
+    Repeated cells share the same resolution, so they don't add points
+    """
+    axes, values = resample_cartesian(dataset["density"], dataset["voxel"], VOLUME_RESOLUTION, repeat=repeat)
+    x, y, z = np.meshgrid(*axes, indexing="ij")
+    return {"x": x.ravel(), "y": y.ravel(), "z": z.ravel(), "value": values.ravel()}
+
+
+def isovalue(dataset, settings):
+    """
+    Density value of the isovalue setting (a fraction of the density range)
+    """
+    v_min, v_max = float(dataset["value_sorted"][0]), float(dataset["value_sorted"][-1])
+    return v_min + settings["isovalue"] * (v_max - v_min)
+
+
+def volume_levels(dataset, settings):
+    """
+    Isovalues and opacity of the volume trace for the current settings - patched on settings changes
+    """
+    opacity = settings["opacity"] if settings["opacity"] is not None else 1
+    # many stacked translucent surfaces: scale the opacity down, or the volume turns opaque
+    return {"isomin": isovalue(dataset, settings), "isomax": float(dataset["value_sorted"][-1]), "opacity": 0.2 * opacity}
+
+
+def isosurface_data(dataset, f_data, settings, encode=BINARY_ENCODING):
+    """
+    Mesh3d properties of the isosurface for the current settings - patched on settings changes
+    The mesh is extracted on the server (only the triangles are sent, not the grid) and cached per isovalue
+    """
+    iso = isovalue(dataset, settings)
+    # repeated cells split the triangle budget between them
+    offsets = repeat_offsets(dataset, settings.get("repeat"))
+    max_faces = max(1, MESH_TRIANGLES // len(offsets))
+    mesh = MESHES.get(
+        (f_data["ID"], f_data["VERSION"], round(iso, 9), max_faces),
+        lambda: isosurface_mesh(dataset["density"], dataset["voxel"], iso, max_faces),
+    )
+    vertices, faces = mesh["vertices"], mesh["faces"]
+    if len(offsets) > 1:
+        faces = (faces[None, :, :] + (np.arange(len(offsets)) * len(vertices))[:, None, None]).reshape(-1, 3)
+        faces = faces.astype(np.int32)
+        vertices = tile_points(vertices, offsets)
+    data = {
+        "x": vertices[:, 0],
+        "y": vertices[:, 1],
+        "z": vertices[:, 2],
+        "i": faces[:, 0],
+        "j": faces[:, 1],
+        "k": faces[:, 2],
+    }
+    if encode:
+        data = {key: encode_array(value, value.dtype) for key, value in data.items()}
+    data["hovertemplate"] = f"val={iso:.5f}<extra></extra>"
+    data["color"] = px.colors.sample_colorscale(px.colors.sequential.Inferno_r, [settings["isovalue"]])[0]
+    data["opacity"] = settings["opacity"] if settings["opacity"] is not None else 1
+    return data
+
+
+def isosurface_trace(dataset, f_data, settings):
+    """
+    go.Mesh3d trace of the isosurface (see isosurface_data)
+    """
+    return go.Mesh3d(**isosurface_data(dataset, f_data, settings, encode=False), flatshading=False)
+
+
+def volume_trace(grid, dataset, settings):
+    """
+    go.Volume trace of the density (see volume_grid)
+    """
+    return go.Volume(
+        **grid,
+        **volume_levels(dataset, settings),
+        surface_count=VOLUME_SURFACES,
+        caps=dict(x_show=False, y_show=False, z_show=False),
+        colorscale=px.colors.sequential.Inferno_r,
+        cmin=float(dataset["value_sorted"][0]),
+        cmax=float(dataset["value_sorted"][-1]),
+        colorbar={"thickness": 10, "title": "", "len": 0.9},
+        hovertemplate="val=%{value}<extra></extra>",
+    )
+
+
+def orthoslice_data(dataset, axis, index):
+    """
+    Surface properties of one lattice plane: views of the density and coordinates, strided to fit a third of POINT_BUDGET
+    (the last row and column are always kept, so the plane spans the whole cell)
+    """
+    n = dataset["density"].shape[axis]
+    index = n // 2 if index is None else min(index, n - 1)
+    # basic indexing: views, no copy of the plane
+    plane_index = (slice(None),) * axis + (index,)
+    plane = dataset["density"][plane_index]
+    coords = dataset["coords"][plane_index]
+    stride = max(1, int(np.ceil(np.sqrt(plane.size / (POINT_BUDGET / 3)))))
+    if stride > 1:
+        # only the (small) strided selection is copied
+        rows, columns = (np.unique(np.r_[np.arange(0, size, stride), size - 1]) for size in plane.shape)
+        plane, coords = plane[np.ix_(rows, columns)], coords[np.ix_(rows, columns)]
+    return {"x": coords[..., 0], "y": coords[..., 1], "z": coords[..., 2], "surfacecolor": plane}
+
+
+def orthoslice_trace(dataset, plane, settings, showscale=False):
+    """
+    go.Surface trace of a lattice plane (see orthoslice_data)
+    """
+    return go.Surface(
+        **plane,
+        colorscale=px.colors.sequential.Inferno_r,
+        cmin=float(dataset["value_sorted"][0]),
+        cmax=float(dataset["value_sorted"][-1]),
+        showscale=showscale,
+        colorbar={"thickness": 10, "title": "", "len": 0.9},
+        opacity=settings["opacity"] if settings["opacity"] is not None else 1,
+        hovertemplate="val=%{surfacecolor}<extra></extra>",
+    )
+
+
+@app.callback(
+    Output("ortho-a", "max"),
+    Output("ortho-b", "max"),
+    Output("ortho-c", "max"),
+    Output("ortho-a", "value"),
+    Output("ortho-b", "value"),
+    Output("ortho-c", "value"),
+    Input("df_store", "data"),
+    prevent_initial_call=True,
+)
+def update_ortho_sliders(f_data):
+    """
+    Sets the ranges of the orthoslice plane sliders to the grid, planes start in the middle of the cell
+    """
+    dataset = DATASETS.get(f_data)
+    if dataset is None:
+        raise PreventUpdate
+    shape = dataset["density"].shape
+    return *[n - 1 for n in shape], *[n // 2 for n in shape]
+
+
+@app.callback(
+    Output("scatter-plot", "figure", allow_duplicate=True),
+    Input("ortho-a", "value"),
+    Input("ortho-b", "value"),
+    Input("ortho-c", "value"),
+    State("plot_settings", "data"),
+    State("df_store", "data"),
+    State("cam_store", "data"),
+    prevent_initial_call=True,
+)
+def move_orthoslice(ortho_a, ortho_b, ortho_c, settings, f_data, cam):
+    """
+    Moves one plane in orthoslice mode - only the surface trace of that plane is patched
+    """
+    if settings is None or settings["mode"] != "orthoslice":
+        raise PreventUpdate
+    dataset = DATASETS.get(f_data)
+    if dataset is None:
+        raise PreventUpdate
+    patched_fig = Patch()
+    # usually one slider, all three when a new dataset resets them
+    for component_id in dash.callback_context.triggered_prop_ids.values():
+        axis = ["ortho-a", "ortho-b", "ortho-c"].index(component_id)
+        plane = orthoslice_data(dataset, axis, [ortho_a, ortho_b, ortho_c][axis])
+        for key, value in plane.items():
+            patched_fig["data"][ORTHO_TRACES[axis]][key] = encode_array(value) if BINARY_ENCODING else value
+    patched_fig["layout"]["scene"]["camera"] = cam
+    return patched_fig
+
+
 @app.callback(
     Output("scatter-plot", "figure", allow_duplicate=True),
     [
@@ -1374,6 +2193,10 @@ def update_main_content(state, data):
         Input("df_store", "data"),
         State("scatter-plot", "figure"),
         State("BOUNDARIES_STORE", "data"),
+        # plane positions in orthoslice mode
+        State("ortho-a", "value"),
+        State("ortho-b", "value"),
+        State("ortho-c", "value"),
     ],
     prevent_initial_call="initial_duplicate",
 )
@@ -1387,6 +2210,9 @@ def update_plot(
         f_data,
         fig,
         boundaries_fig,
+        ortho_a=None,
+        ortho_b=None,
+        ortho_c=None,
 ):
     """
     Updates the scatter-plot
@@ -1406,8 +2232,18 @@ def update_plot(
     # Last Camera-Pos
     new_cam = stored_cam_settings
 
+    # the render mode or the repetition of the cell changed: the density trace has to be replaced
+    mode_switch = (
+        dash.callback_context.triggered_id == "plot_settings"
+        and fig is not None
+        and (
+            fig["data"][0].get("type", "scatter3d") != RENDER_TRACE_TYPES[settings["mode"]]
+            or (fig["layout"].get("meta") or {}).get("repeat", [1, 1, 1]) != settings.get("repeat", [1, 1, 1])
+        )
+    )
+
     # INIT PLOT
-    if dash.callback_context.triggered[0]["prop_id"] == "." or dash.callback_context.triggered_id == "df_store":
+    if dash.callback_context.triggered[0]["prop_id"] == "." or dash.callback_context.triggered_id == "df_store" or mode_switch:
         """
         INIT PLOT
         Create a Figure that overwrites the default figure (a single blue dot)
@@ -1418,41 +2254,59 @@ def update_plot(
         """
         print("INIT Plot")
         # Our main figure = scatter plot
+        dataset = DATASETS.get(f_data)
+        if dataset is None:
+            raise PreventUpdate
 
-        df = pd.DataFrame(f_data["MALA_DF"]["scatter"])
-        # sheared coordinates
-
-        # atoms-Dataframe also taken from f_data
-        atoms = pd.DataFrame(f_data["INPUT_DF"])
+        # atom positions also taken from the dataset
+        # repeated cells (display only): the points of one cell translated by these offsets
+        offsets = repeat_offsets(dataset, settings.get("repeat"))
+        atoms = pd.DataFrame(tile_points(dataset["atoms"], offsets), columns=["x", "y", "z"])
         no_of_atoms = len(atoms)
 
         # Cell
         fig_bound = boundaries_fig
 
-        patched_fig = px.scatter_3d(
-            df,
-            x="x",
-            y="y",
-            z="z",
-            color="val",
-            hover_data=["val"],
-            color_continuous_scale=px.colors.sequential.Inferno_r,
-            range_color=[min(df["val"]), max(df["val"])],
-        )
+        if settings["mode"] == "scatter":
+            # sheared coordinates, at the finest level of the pyramid that fits the point budget (shared by all copies)
+            coords, values, _ = slice_pyramid(dataset, [None, None, None], None, POINT_BUDGET // len(offsets))
+            df = pd.DataFrame(tile_points(coords, offsets), columns=["x", "y", "z"])
+            df["val"] = np.tile(values, len(offsets))
+
+            patched_fig = px.scatter_3d(
+                df,
+                x="x",
+                y="y",
+                z="z",
+                color="val",
+                hover_data=["val"],
+                color_continuous_scale=px.colors.sequential.Inferno_r,
+                range_color=[dataset["value_sorted"][0], dataset["value_sorted"][-1]],
+            )
+            patched_fig.update_traces(
+                patch={"marker": {"size": settings["size"], "line": settings["outline"]}}
+            )
+        elif settings["mode"] == "volume":
+            grid = volume_grid(dataset, settings.get("repeat"))
+            patched_fig = go.Figure(volume_trace(grid, dataset, settings))
+        elif settings["mode"] == "isosurface":
+            patched_fig = go.Figure(isosurface_trace(dataset, f_data, settings))
+        else:
+            planes = [orthoslice_data(dataset, axis, index) for axis, index in enumerate([ortho_a, ortho_b, ortho_c])]
+            patched_fig = go.Figure(orthoslice_trace(dataset, planes[0], settings, showscale=True))
         patched_fig.update_layout(
             margin=dict(l=0, r=0, b=0, t=0),
             paper_bgcolor="#f8f9fa",
             showlegend=False,
             modebar_remove=["zoom", "resetcameradefault", "resetcameralastsave"],
             template=templ1,
+            # read by the slicing (clientside and slice_plot) to tile the slices the same way
+            meta={"repeat": settings.get("repeat", [1, 1, 1]), "offsets": offsets.tolist()},
         )
 
         patched_fig.update_coloraxes(
             colorbar={"thickness": 10, "title": "", "len": 0.9}
         )
-        patched_fig.update_traces(
-            patch={"marker": {"size": settings["size"], "line": settings["outline"]}}
-        )
 
         # adding helper-figure to keep camera-zoom the same, regardless of data(-slicing)-changes
         # equals the cell boundaries, but has slight offset to the main plot (due to not voxels, but ertices being scatter plotted)
@@ -1480,6 +2334,30 @@ def update_plot(
                 ),
             )
         )
+        if settings["mode"] == "orthoslice":
+            # b and c plane after the atoms, so the cell and atoms keep their trace indices in every mode
+            for plane in planes[1:]:
+                patched_fig.add_trace(orthoslice_trace(dataset, plane, settings))
+
+        if BINARY_ENCODING:
+            # swap the voxel trace's number lists for typed arrays (validators of go.Figure don't accept them)
+            patched_fig = patched_fig.to_plotly_json()
+            voxels = patched_fig["data"][0]
+            if settings["mode"] == "scatter":
+                for axis in ["x", "y", "z"]:
+                    voxels[axis] = encode_array(df[axis])
+                voxels["marker"]["color"] = encode_array(df["val"])
+                voxels["customdata"] = encode_array(df[["val"]])
+            elif settings["mode"] == "volume":
+                for key in ["x", "y", "z", "value"]:
+                    voxels[key] = encode_array(grid[key])
+            elif settings["mode"] == "isosurface":
+                voxels.update(isosurface_data(dataset, f_data, settings, encode=True))
+            else:
+                for trace, plane in zip(ORTHO_TRACES, planes):
+                    patched_fig["data"][trace].update(
+                        {key: encode_array(value) for key, value in plane.items()}
+                    )
 
     # SETTINGS
     elif dash.callback_context.triggered_id == "plot_settings":
@@ -1492,9 +2370,26 @@ def update_plot(
             visibility of atoms
         """
         print("PLOT-Settings")
-        patched_fig["data"][0]["marker"]["line"] = settings["outline"]
-        patched_fig["data"][0]["marker"]["size"] = settings["size"]
-        patched_fig["data"][0]["marker"]["opacity"] = settings["opacity"]
+        if settings["mode"] == "scatter":
+            patched_fig["data"][0]["marker"]["line"] = settings["outline"]
+            patched_fig["data"][0]["marker"]["size"] = settings["size"]
+            patched_fig["data"][0]["marker"]["opacity"] = settings["opacity"]
+        else:
+            dataset = DATASETS.get(f_data)
+            if dataset is None:
+                raise PreventUpdate
+            if settings["mode"] == "volume":
+                # only the isovalue and opacity change, the resampled grid stays in the browser
+                levels = volume_levels(dataset, settings)
+            elif settings["mode"] == "isosurface":
+                levels = isosurface_data(dataset, f_data, settings)
+            else:
+                levels = {}
+                for trace in ORTHO_TRACES[1:]:
+                    patched_fig["data"][trace]["opacity"] = settings["opacity"]
+                levels["opacity"] = settings["opacity"]
+            for key, value in levels.items():
+                patched_fig["data"][0][key] = value
         for i in [1, 2, 3, 4]:
             patched_fig["data"][i]["line"]["width"] = settings["cell"]
         patched_fig["data"][5]["visible"] = settings["atoms"]
@@ -1540,9 +2435,45 @@ def update_plot(
     return patched_fig
 
 
-# TODO optimize by using relayout to update camera instead of cam_store (or smth else entirely)
 @app.callback(
-    Output("scatter-plot", "figure"),
+    Output("client_grid", "data"),
+    Input("df_store", "data"),
+    prevent_initial_call=True,
+)
+def load_client_grid(f_data):
+    """
+    Sends the grid (all levels of its pyramid) to the browser once for clientside slicing, if it fits CLIENT_MEMORY_BUDGET
+    """
+    dataset = DATASETS.get(f_data)
+    if dataset is None:
+        return None
+    # the browser picks the level for the repeat it shows, so it gets the levels any repeat may need
+    # (those below POINT_BUDGET add at most a seventh of it)
+    extend_pyramid(dataset, POINT_BUDGET // MAX_REPEAT**3)
+    levels = [pyramid_level(dataset, level) for level in range(int(dataset["pyramid_levels"]))]
+    # 3 coordinates + density, float32 each
+    if sum(density.size for density, _ in levels) * 16 > CLIENT_MEMORY_BUDGET * 1024**2:
+        return None
+    return {
+        "VERSION": f_data["VERSION"],
+        "budget": POINT_BUDGET,
+        "levels": [
+            {
+                "shape": list(density.shape),
+                "density": encode_array(density.ravel()),
+                "coords": encode_array(coords.ravel()),
+            }
+            for density, coords in levels
+        ],
+        "steps": encode_array(dataset["value_steps"]),
+    }
+
+
+# Slices in the browser if client_grid holds the grid, otherwise hands the tool state to slice_plot via slice_request
+app.clientside_callback(
+    ClientsideFunction(namespace="clientside", function_name="slice_plot"),
+    Output("scatter-plot", "figure", allow_duplicate=True),
+    Output("slice_request", "data"),
     # Tools
     Input("slider-val", "value"),
     Input("filter-val", "active"),
@@ -1553,76 +2484,115 @@ def update_plot(
     Input("slider-z", "value"),
     Input("slice-z", "active"),
     # Data
+    State("client_grid", "data"),
+    State("scatter-plot", "figure"),
+    State("cam_store", "data"),
+    State("slice_throttle", "data"),
+    prevent_initial_call=True,
+)
+
+
+# TODO optimize by using relayout to update camera instead of cam_store (or smth else entirely)
+@app.callback(
+    Output("scatter-plot", "figure"),
+    Input("slice_request", "data"),
+    # Data
     State("df_store", "data"),
     State("cam_store", "data"),
     prevent_initial_call=True,
 )
-def slice_plot(
-    slider_range,
-    dense_inactive,
-    slider_range_cs_x,
-    cs_x_inactive,
-    slider_range_cs_y,
-    cs_y_inactive,
-    slider_range_cs_z,
-    cs_z_inactive,
-    f_data,
-    cam,
-):
+def slice_plot(request, f_data, cam):
     """
-    Updates the scatter-plot according to the tools by filtering the data
-    TODO: Try doing this Clientside for performance improvements
+    Updates the scatter-plot according to the tools by slicing the data (fallback for grids too big for clientside slicing)
+    x/y/z sliders select index ranges along the lattice axes, so the visible subset is a view into the density grid
+    request holds the slider values of the active tools ("x", "y", "z", "val"), None for inactive ones,
+    and its sequence number "SEQ" - requests superseded by a newer one of the session are dropped
     """
-    if f_data is None:
+    if f_data is None or request is None:
         raise PreventUpdate
-    df = pd.DataFrame(f_data["MALA_DF"]["scatter"])
-    dfu = (
-        df.copy()
-    )  # this is a subset of df after one if-case is run. For every if-case, we need the subset+the original
+    session_id, seq = f_data["ID"], request.get("SEQ")
+    if not SLICE_REQUESTS.offer(session_id, seq):
+        raise PreventUpdate
+    with SLICE_REQUESTS.turn(session_id):
+        # newer requests may have arrived while waiting for the previous one
+        if not SLICE_REQUESTS.is_latest(session_id, seq):
+            raise PreventUpdate
+        patched_fig = slice_figure(request, f_data, cam)
+        if not SLICE_REQUESTS.is_latest(session_id, seq):
+            raise PreventUpdate
+    return patched_fig
 
-    # TOOLS
-    # filter-by-density
-    if slider_range is not None and dense_inactive:  # Any slider Input there? Do:
-        low, high = slider_range
-        mask = (dfu["val"] >= np.unique(df["val"])[low]) & (
-                dfu["val"] <= np.unique(df["val"])[high]
-        )
-        dfu = dfu[mask]
 
-    # slice X
-    if slider_range_cs_x is not None and cs_x_inactive:  # Any slider Input there? Do:
-        low, high = slider_range_cs_x
-        mask = (dfu["x"] >= np.unique(df["x"])[low]) & (
-                dfu["x"] <= np.unique(df["x"])[high]
-        )
-        dfu = dfu[mask]
+def slice_figure(request, f_data, cam):
+    """
+    Patch of the scatter-plot showing the slice described by request (see slice_plot)
+    """
+    dataset = DATASETS.get(f_data)
+    if dataset is None:
+        raise PreventUpdate
 
-    # slice Y
-    if slider_range_cs_y is not None and cs_y_inactive:  # Any slider Input there? Do:
-        low, high = slider_range_cs_y
-        mask = (dfu["y"] >= np.unique(df["y"])[low]) & (
-                dfu["y"] <= np.unique(df["y"])[high]
-        )
-        dfu = dfu[mask]
+    # TOOLS
+    # slice X/Y/Z: index ranges (None = whole axis)
+    ranges = [request["x"], request["y"], request["z"]]
+    # filter-by-density
+    value_range = None
+    if request["val"] is not None:
+        low, high = request["val"]
+        value_range = [dataset["value_steps"][low], dataset["value_steps"][high]]
 
-    # slice Z
-    if slider_range_cs_z is not None and cs_z_inactive:  # Any slider Input there? Do:
-        low, high = slider_range_cs_z
-        mask = (dfu["z"] >= np.unique(df["z"])[low]) & (
-                dfu["z"] <= np.unique(df["z"])[high]
-        )
-        dfu = dfu[mask]
+    # smaller slices are shown at finer levels of the pyramid, repeated cells share the point budget
+    offsets = repeat_offsets(dataset, request.get("repeat"))
+    coords, values, _ = slice_pyramid(dataset, ranges, value_range, POINT_BUDGET // len(offsets))
+    coords, values = tile_points(coords, offsets), np.tile(values, len(offsets))
 
     patched_fig = Patch()
-    patched_fig["data"][0]["x"] = dfu["x"]
-    patched_fig["data"][0]["y"] = dfu["y"]
-    patched_fig["data"][0]["z"] = dfu["z"]
-    patched_fig["data"][0]["marker"]["color"] = dfu["val"]
+    if BINARY_ENCODING:
+        patched_fig["data"][0]["x"] = encode_array(coords[:, 0])
+        patched_fig["data"][0]["y"] = encode_array(coords[:, 1])
+        patched_fig["data"][0]["z"] = encode_array(coords[:, 2])
+        patched_fig["data"][0]["marker"]["color"] = encode_array(values)
+    else:
+        patched_fig["data"][0]["x"] = coords[:, 0]
+        patched_fig["data"][0]["y"] = coords[:, 1]
+        patched_fig["data"][0]["z"] = coords[:, 2]
+        patched_fig["data"][0]["marker"]["color"] = values
     # sadly the patch overwrites our cam positioning, which is why we have to re-patch it everytime
     patched_fig["layout"]["scene"]["camera"] = cam
     return patched_fig
 
 
+@app.callback(
+    Output("plane-image", "src"),
+    Output("plane-index", "max"),
+    Output("plane-label", "children"),
+    Input("plane-axis", "value"),
+    Input("plane-index", "value"),
+    Input("plane-collapse", "is_open"),
+    Input("df_store", "data"),
+    prevent_initial_call=True,
+)
+def update_plane(axis, index, is_open, f_data):
+    """
+    Renders one lattice plane of the density as PNG (a few KB per plane, instead of the coordinates of every point)
+    """
+    if not is_open:
+        raise PreventUpdate
+    dataset = DATASETS.get(f_data)
+    if dataset is None:
+        raise PreventUpdate
+    density = dataset["density"]
+    n = density.shape[axis]
+    index = min(index or 0, n - 1)
+    # no more than ~2 pixels per grid point, the browser scales the image up
+    resolution = min(PLANE_RESOLUTION, 2 * max(np.delete(density.shape, axis)))
+    values = plane_values(density, dataset["voxel"], axis, index, resolution)
+    rgba = colormap(
+        values, dataset["value_sorted"][0], dataset["value_sorted"][-1], px.colors.sequential.Inferno_r
+    )
+    label = f"{'abc'[axis]} = {index / n:.3f} (layer {index + 1} of {n})"
+    return encode_png(rgba), n - 1, label
+
+
 @app.callback(
     Output("orientation", "figure"),
     Input("cam_store", "data"),
@@ -1648,18 +2618,20 @@ def update_orientation(saved):
     Output("totalEn", "children"),
     Output("fermiEn", "children"),
     [Input("df_store", "data"), Input("page_state", "data")],
+    State("total_energy", "data"),
     prevent_initial_call=True,
 )
-def update_footer(f_data, state):
+def update_footer(f_data, state, total_energy):
     """
     Updates the footer content: Energy-table and DOS-plot
     """
     if state == "landing":
         raise PreventUpdate
 
-    if f_data is not None:
+    dataset = DATASETS.get(f_data)
+    if dataset is not None:
         # PLOT data
-        dOs = f_data["MALA_DATA"]["density_of_states"]
+        dOs = dataset["density_of_states"]
         df = pd.DataFrame(dOs)
 
         fig = go.Figure()
@@ -1690,9 +2662,15 @@ def update_footer(f_data, state):
         )
 
         # TABLE data
-        band_en = f_data["MALA_DATA"]["band_energy"]
-        total_en = f_data["MALA_DATA"]["total_energy"]
-        fermi_en = f_data["MALA_DATA"]["fermi_energy"]
+        band_en = dataset["band_energy"]
+        total_en = dataset["total_energy"]
+        if np.isnan(total_en):
+            # computed in the background, update_total_energy fills it in
+            if total_energy is not None and total_energy["VERSION"] == f_data["VERSION"]:
+                total_en = total_energy["value"]
+            else:
+                total_en = "computing..."
+        fermi_en = dataset["fermi_energy"]
 
     else:
         # Defaults in case of reset or data missing for some reaso
@@ -1704,6 +2682,223 @@ def update_footer(f_data, state):
     return fig, band_en, total_en, fermi_en
 
 
+@app.callback(
+    Output("total_energy_job", "data"),
+    Output("total-energy-poll", "disabled"),
+    Output("totalEn", "children", allow_duplicate=True),
+    Input("df_store", "data"),
+    State("inference_job", "data"),
+    State("UP_STORE", "data"),
+    prevent_initial_call=True,
+)
+def start_total_energy(f_data, job, upload):
+    """
+    Computes the total energy of a new dataset in the background, from the LDOS its inference kept
+    (the density and the other energies are shown right away)
+    """
+    dataset = DATASETS.get(f_data)
+    if dataset is None or job is None or upload is None or not np.isnan(dataset["total_energy"]):
+        raise PreventUpdate
+    atoms, repeat = inference_atoms(upload)
+    ldos_file = session_ldos_file(upload, atoms, job["MODEL"])
+    if not ldos_file.exists():
+        return None, True, "-"
+    estimate = estimate_total_energy(job["MODEL"], atoms)
+    if ADMISSION.decide(estimate) == "reject":
+        release_ldos(ldos_file, job["MODEL"])
+        return None, True, "skipped (exceeds the server's budget)"
+
+    energy_job = ADMISSION.submit(
+        upload["ID"],
+        run_total_energy,
+        dict(
+            atoms_to_predict=atoms,
+            model_and_temp={"name": job["MODEL"], "temperature": job["TEMPERATURE"]},
+            ldos_file=str(ldos_file),
+        ),
+        estimate,
+    )
+    copies = int(np.prod(repeat))
+    energy_job.update(
+        KEY=job["KEY"], VERSION=f_data["VERSION"], COPIES=copies, MODEL=job["MODEL"], LDOS=str(ldos_file),
+        # what update_total_energy records the run with, to calibrate estimate_total_energy
+        N_ATOMS=len(atoms), VOLUME=atoms.get_volume(), GRID_POINTS=int(np.prod(dataset["grid_dimensions"])) // copies,
+    )
+    read_ldos(ldos_file, energy_job)
+    return energy_job, False, "computing..."
+
+
+@app.callback(
+    Output("totalEn", "children", allow_duplicate=True),
+    Output("total_energy", "data"),
+    Output("total-energy-poll", "disabled", allow_duplicate=True),
+    Input("total-energy-poll", "n_intervals"),
+    State("total_energy_job", "data"),
+    State("df_store", "data"),
+    prevent_initial_call=True,
+)
+def update_total_energy(n_intervals, energy_job, f_data):
+    """
+    Fills in the total energy once its job finished, and adds it to the cached result of the inference
+    """
+    if energy_job is None:
+        raise PreventUpdate
+    status = JOBS.status(energy_job)
+    if status in ["queued", "running"]:
+        raise PreventUpdate
+    elif status == "unknown":
+        return "-", dash.no_update, True
+    try:
+        total_energy = JOBS.result(energy_job)
+    except RuntimeError as error:
+        print(error)
+        release_ldos(energy_job["LDOS"], energy_job["MODEL"])
+        return "failed", dash.no_update, True
+
+    # calibrates future estimates of the total energy
+    stats = JOBS.stats(energy_job)
+    if stats is not None:
+        ESTIMATOR.record(
+            energy_job["MODEL"],
+            energy_job["N_ATOMS"],
+            energy_job["VOLUME"],
+            energy_job["GRID_POINTS"],
+            stats["time"],
+            stats["memory"],
+            kind="total_energy",
+        )
+    cached = RESULTS.get(energy_job["KEY"])
+    if cached is not None:
+        cached["total_energy"] = total_energy
+        RESULTS.put(energy_job["KEY"], cached)
+    release_ldos(energy_job["LDOS"], energy_job["MODEL"])
+    # supercells: the total energy of the whole structure (see prepare_supercell_dataset)
+    value = total_energy * energy_job["COPIES"]
+    if f_data is None or f_data["VERSION"] != energy_job["VERSION"]:
+        # another dataset is shown by now
+        return dash.no_update, dash.no_update, True
+    return value, {"VERSION": energy_job["VERSION"], "value": value}, True
+
+
+def parse_temperatures(text):
+    """
+    Temperatures of a sweep, given as "start:stop:step" (stop included) or as comma separated list
+    """
+    if ":" in text:
+        start, stop, step = (float(part) for part in text.split(":"))
+        if step <= 0:
+            raise ValueError("step must be positive")
+        return list(np.arange(start, stop + step / 2, step))
+    return [float(part) for part in text.split(",") if part.strip()]
+
+
+@app.callback(
+    Output("sweep_jobs", "data"),
+    Output("sweep-poll", "disabled"),
+    Output("sweep-status", "children"),
+    Input("run-sweep", "n_clicks"),
+    State("sweep-temps", "value"),
+    State("UP_STORE", "data"),
+    State("model-choice", "value"),
+    prevent_initial_call=True,
+)
+def submit_sweep(click, temps, upload, model_choice):
+    """
+    Evaluates the stored LDOS of the last inference (see session_ldos_file) for a list of temperatures,
+    split into one job per inference worker
+    """
+    if upload is None or model_choice is None or not temps:
+        raise PreventUpdate
+    limits = temperature_range(model_choice)
+    if limits is None:
+        return None, True, "Sweeps need a model with a temperature range"
+    atoms, repeat = inference_atoms(upload)
+    ldos_file = session_ldos_file(upload, atoms, model_choice)
+    if not ldos_file.exists():
+        return None, True, "Run an inference with this model first"
+    try:
+        temperatures = parse_temperatures(temps)
+    except ValueError:
+        return None, True, "Temperatures: start:stop:step or a comma separated list"
+    if not 0 < len(temperatures) <= MAX_SWEEP_TEMPERATURES:
+        return None, True, f"Between 1 and {MAX_SWEEP_TEMPERATURES} temperatures"
+    if min(temperatures) < limits[0] or max(temperatures) > limits[1]:
+        return None, True, f"The model covers {limits[0]:g} K to {limits[1]:g} K"
+
+    jobs = [
+        JOBS.submit(
+            upload["ID"],
+            run_temperature_sweep,
+            dict(atoms_to_predict=atoms, model_name=model_choice, ldos_file=str(ldos_file),
+                 temperatures=[float(t) for t in chunk]),
+        )
+        for chunk in np.array_split(temperatures, min(INFERENCE_WORKERS, len(temperatures)))
+    ]
+    for job in jobs:
+        read_ldos(ldos_file, job)
+    return {"JOBS": jobs, "REPEAT": repeat, "MODEL": model_choice, "LDOS": str(ldos_file)}, False, f"Sweeping {len(temperatures)} temperatures"
+
+
+@app.callback(
+    Output("sweep-plot", "figure"),
+    Output("sweep-poll", "disabled", allow_duplicate=True),
+    Output("sweep-status", "children", allow_duplicate=True),
+    Input("sweep-poll", "n_intervals"),
+    State("sweep_jobs", "data"),
+    prevent_initial_call=True,
+)
+def update_sweep(n_intervals, sweep):
+    """
+    Plots band and Fermi energy over the temperature once all jobs of the sweep finished
+    """
+    if sweep is None:
+        raise PreventUpdate
+    states = [JOBS.status(job) for job in sweep["JOBS"]]
+    if any(state in ["queued", "running"] for state in states):
+        done = states.count("done") + states.count("failed")
+        return dash.no_update, dash.no_update, f"Sweep running ({done}/{len(states)} jobs done)"
+    # deletes the LDOS if a newer inference superseded it while the sweep read it
+    release_ldos(sweep["LDOS"], sweep["MODEL"])
+    try:
+        energies = [energy for job in sweep["JOBS"] for energy in JOBS.result(job)]
+    except RuntimeError as error:
+        print(error)
+        return dash.no_update, True, "Sweep failed"
+
+    # supercells: the band energy of the whole structure, like in the energy table
+    copies = int(np.prod(sweep["REPEAT"]))
+    temperatures = [energy["temperature"] for energy in energies]
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=temperatures,
+            y=[energy["band_energy"] * copies for energy in energies],
+            name="Band energy",
+            line=dict(color="#f15e64", width=2),
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=temperatures,
+            y=[energy["fermi_energy"] for energy in energies],
+            name="Fermi energy",
+            yaxis="y2",
+            line=dict(color="#5e8ef1", width=2, dash="dot"),
+        )
+    )
+    fig.update_layout(
+        margin=dict(l=0, r=0, b=0, t=0),
+        showlegend=False,
+        paper_bgcolor="#f8f9fa",
+        plot_bgcolor="#f8f9fa",
+        xaxis={"gridcolor": "#D3D3D3", "linecolor": "black", "title": None},
+        yaxis={"gridcolor": "#D3D3D3", "linecolor": "black"},
+        yaxis2={"overlaying": "y", "side": "right", "showgrid": False},
+        hovermode="x unified",
+    )
+    return fig, True, "Band energy (solid) and Fermi energy (dotted) over T in K"
+
+
 @app.callback(
     Output("settings-offcanvas", "is_open"),
     Input("page_state", "data"),
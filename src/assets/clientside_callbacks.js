@@ -1,22 +1,203 @@
+// Decoding of the typed-array specs written by src/utils/encoding.py ({dtype, bdata, shape})
+const TYPED_ARRAYS = {
+    f8: Float64Array,
+    f4: Float32Array,
+    i4: Int32Array,
+    u4: Uint32Array,
+    i2: Int16Array,
+    u2: Uint16Array,
+    i1: Int8Array,
+    u1: Uint8Array,
+};
+
+function decodeArray(spec) {
+    if (!spec || typeof spec.bdata !== "string") {
+        // plain (unencoded) list
+        return spec;
+    }
+    const binary = atob(spec.bdata);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    // integer columns (f.e. point counts) come as i4/u4, exact up to 2^31/2^32
+    return new TYPED_ARRAYS[spec.dtype](bytes.buffer);
+}
+
+function decodeColumns(columns) {
+    const decoded = {};
+    for (const name in columns) {
+        decoded[name] = decodeArray(columns[name]);
+    }
+    return decoded;
+}
 
 window.dash_clientside = Object.assign({}, window.dash_clientside, {
-    clientside: {
-        update_slider: function(click, data) {
-            console.log("update tools");
-            let output = [0, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1];
+    encoding: {decodeArray: decodeArray, decodeColumns: decodeColumns},
+});
 
-            if (Object.is(data, null)) {
-                console.log("data null");
-            } else {
-                console.log("data not null");
+// Clientside slicing: the grid sent by load_client_grid (src/app.py) is decoded once and sliced in the browser
+let clientGrid = null;
 
+function getClientGrid(data) {
+    if (clientGrid === null || clientGrid.version !== data.VERSION) {
+        clientGrid = {
+            version: data.VERSION,
+            budget: data.budget,
+            levels: data.levels.map(function(level) {
+                return {shape: level.shape, density: decodeArray(level.density), coords: decodeArray(level.coords)};
+            }),
+            steps: decodeArray(data.steps),
+        };
+    }
+    return clientGrid;
+}
 
+function levelRanges(ranges, level) {
+    // index ranges of level 0 at a level of the pyramid, see src/utils/pyramid.py
+    return ranges.map(function(range) {
+        return range === null ? null : [Math.min(range[0], range[1]) >> level, Math.max(range[0], range[1]) >> level];
+    });
+}
 
+function chooseLevel(grid, ranges, budget) {
+    // finest level whose slice fits the point budget, the coarsest level if none does
+    for (let level = 0; level < grid.levels.length; level++) {
+        const shape = grid.levels[level].shape;
+        let size = 1;
+        levelRanges(ranges, level).forEach(function(range, axis) {
+            const n = shape[axis];
+            size *= range === null ? n : Math.max(0, Math.min(range[1], n - 1) - Math.max(range[0], 0) + 1);
+        });
+        if (size <= budget) {
+            return level;
+        }
+    }
+    return grid.levels.length - 1;
+}
 
+function sliceGrid(grid, ranges, valueRange) {
+    // same selection as src/utils/slicing.py: inclusive index ranges per lattice axis, inclusive value range
+    const [nx, ny, nz] = grid.shape;
+    const low = [0, 0, 0];
+    const high = [nx - 1, ny - 1, nz - 1];
+    ranges.forEach(function(range, axis) {
+        if (range !== null) {
+            low[axis] = Math.max(0, Math.min(range[0], range[1]));
+            high[axis] = Math.min(grid.shape[axis] - 1, Math.max(range[0], range[1]));
+        }
+    });
+    const size = Math.max(0, (high[0] - low[0] + 1) * (high[1] - low[1] + 1) * (high[2] - low[2] + 1));
+    const x = new Float32Array(size);
+    const y = new Float32Array(size);
+    const z = new Float32Array(size);
+    const color = new Float32Array(size);
+    let n = 0;
+    for (let i = low[0]; i <= high[0]; i++) {
+        for (let j = low[1]; j <= high[1]; j++) {
+            const row = (i * ny + j) * nz;
+            for (let k = low[2]; k <= high[2]; k++) {
+                const value = grid.density[row + k];
+                if (valueRange !== null && (value < valueRange[0] || value > valueRange[1])) {
+                    continue;
+                }
+                x[n] = grid.coords[3 * (row + k)];
+                y[n] = grid.coords[3 * (row + k) + 1];
+                z[n] = grid.coords[3 * (row + k) + 2];
+                color[n] = value;
+                n++;
             }
+        }
+    }
+    return {x: x.subarray(0, n), y: y.subarray(0, n), z: z.subarray(0, n), color: color.subarray(0, n)};
+}
 
-
-            return output;
+function tileSlice(sliced, offsets) {
+    // copies of the slice translated to every repeated cell, see tile_points in src/utils/geometry.py
+    if (!offsets || offsets.length <= 1) {
+        return sliced;
+    }
+    const n = sliced.x.length;
+    const tiled = {
+        x: new Float32Array(n * offsets.length),
+        y: new Float32Array(n * offsets.length),
+        z: new Float32Array(n * offsets.length),
+        color: new Float32Array(n * offsets.length),
+    };
+    offsets.forEach(function(offset, copy) {
+        for (let i = 0; i < n; i++) {
+            tiled.x[copy * n + i] = sliced.x[i] + offset[0];
+            tiled.y[copy * n + i] = sliced.y[i] + offset[1];
+            tiled.z[copy * n + i] = sliced.z[i] + offset[2];
         }
+        tiled.color.set(sliced.color, copy * n);
+    });
+    return tiled;
+}
+
+// Throttling of the slicing requests sent to the server (slice_request), see slice_plot in src/app.py
+let sliceSeq = 0;
+let lastSliceRequest = 0;
+let trailingSliceRequest = null;
+
+function throttleSliceRequest(request, throttle) {
+    // increasing across page reloads, so the server can tell the latest request of a session
+    sliceSeq = Math.max(Date.now(), sliceSeq + 1);
+    request.SEQ = sliceSeq;
+    if (trailingSliceRequest !== null) {
+        clearTimeout(trailingSliceRequest);
+        trailingSliceRequest = null;
+    }
+    const wait = lastSliceRequest + throttle - Date.now();
+    if (wait <= 0) {
+        lastSliceRequest = Date.now();
+        return request;
     }
-});
\ No newline at end of file
+    // the last state of a drag is always sent, once the throttle time has passed
+    trailingSliceRequest = setTimeout(function() {
+        trailingSliceRequest = null;
+        lastSliceRequest = Date.now();
+        window.dash_clientside.set_props("slice_request", {data: request});
+    }, wait);
+    return window.dash_clientside.no_update;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clientside: {
+        slice_plot: function(valRange, valActive, xRange, xActive, yRange, yActive, zRange, zActive, gridData, figure, cam, throttle) {
+            const request = {
+                val: valActive ? valRange : null,
+                x: xActive ? xRange : null,
+                y: yActive ? yRange : null,
+                z: zActive ? zRange : null,
+            };
+            // repeated cells (display only), set by update_plot
+            const meta = (figure && figure.layout.meta) || {};
+            request.repeat = meta.repeat || null;
+            if (figure && figure.data[0].type !== "scatter3d") {
+                // volume/isosurface mode: the slicing tools only apply to the points
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+            }
+            if (!gridData || !figure) {
+                // grid too big for the browser (or not loaded yet): slice_plot on the server takes over
+                return [window.dash_clientside.no_update, throttleSliceRequest(request, throttle || 0)];
+            }
+            const grid = getClientGrid(gridData);
+            const valueRange = request.val ? [grid.steps[request.val[0]], grid.steps[request.val[1]]] : null;
+            const ranges = [request.x || null, request.y || null, request.z || null];
+            const offsets = meta.offsets || [[0, 0, 0]];
+            // the copies share the point budget
+            const level = chooseLevel(grid, ranges, Math.floor(grid.budget / offsets.length));
+            const sliced = tileSlice(sliceGrid(grid.levels[level], levelRanges(ranges, level), valueRange), offsets);
+
+            const voxels = Object.assign({}, figure.data[0], {x: sliced.x, y: sliced.y, z: sliced.z});
+            voxels.marker = Object.assign({}, figure.data[0].marker, {color: sliced.color});
+            const layout = Object.assign({}, figure.layout);
+            if (cam) {
+                layout.scene = Object.assign({}, layout.scene, {camera: cam});
+            }
+            return [Object.assign({}, figure, {data: [voxels].concat(figure.data.slice(1)), layout: layout}),
+                    window.dash_clientside.no_update];
+        },
+    },
+});
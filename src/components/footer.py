@@ -144,6 +144,74 @@ bar = dbc.Container(
                     width="auto",
                     align="center",
                 ),
+                # energies over a list of temperatures, derived from the LDOS of a temperature-ranged model
+                dbc.Col(
+                    dbc.Card(
+                        dbc.CardBody(
+                            [
+                                html.H6(
+                                    "Temperature sweep",
+                                    style={
+                                        "fontSize": "0.85em",
+                                        "fontWeight": "bold",
+                                    },
+                                ),
+                                dbc.InputGroup(
+                                    [
+                                        dbc.Input(
+                                            id="sweep-temps",
+                                            placeholder="100:933:50 or 100, 300",
+                                            style={"fontSize": "0.85em"},
+                                        ),
+                                        dbc.Button("Sweep", id="run-sweep", n_clicks=0, style={"fontSize": "0.85em"}),
+                                    ],
+                                    size="sm",
+                                ),
+                                html.P(id="sweep-status", style={"fontSize": "0.75em", "margin": 0}),
+                                dcc.Graph(
+                                    id="sweep-plot",
+                                    style={
+                                        "width": "30vh",
+                                        "height": "10vh",
+                                        "background": "#f8f9fa",
+                                    },
+                                    config={"displaylogo": False},
+                                ),
+                                dcc.Store(id="sweep_jobs"),
+                                dcc.Interval(id="sweep-poll", interval=1000, disabled=True),
+                            ]
+                        )
+                    ),
+                    width="auto",
+                    align="center",
+                ),
+                # energies per frame of a batch inference (see the inference popup)
+                dbc.Col(
+                    dbc.Card(
+                        dbc.CardBody(
+                            [
+                                html.H6(
+                                    "Trajectory",
+                                    style={
+                                        "fontSize": "0.85em",
+                                        "fontWeight": "bold",
+                                    },
+                                ),
+                                dcc.Graph(
+                                    id="batch-plot",
+                                    style={
+                                        "width": "30vh",
+                                        "height": "10vh",
+                                        "background": "#f8f9fa",
+                                    },
+                                    config={"displaylogo": False},
+                                ),
+                            ]
+                        )
+                    ),
+                    width="auto",
+                    align="center",
+                ),
             ],
             style={"height": "min-content", "padding": 0},
             justify="center",
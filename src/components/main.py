@@ -2,6 +2,7 @@ from dash import html, dcc
 import dash_bootstrap_components as dbc
 import plotly.graph_objs as go
 from src.components.tools import plot_tools
+from src.components.plane import plane_view
 
 
 # for Plot
@@ -117,6 +118,8 @@ STORE Variable & Card for the main plot
 """
 plot = [
     dcc.Store(id="cam_store"),
+    dcc.Store(id="client_grid"),  # typed arrays of the grid, if it is sliced clientside
+    dcc.Store(id="slice_request"),  # tool state for slicing on the server
     dbc.Card(
         dbc.CardBody(
             [
@@ -140,7 +143,9 @@ plot = [
                             style=plot_layout,
                             config={"displaylogo": False},
                         ),
-                    ]
+                        plane_view,
+                    ],
+                    style={"flexWrap": "nowrap"},
                 ),
                 # Button for plot-tools
                 dbc.Row(
@@ -155,6 +160,15 @@ plot = [
                             style={"width": "5em", "height": "1.2em"},
                             n_clicks=0,
                         ),
+                        dbc.Button(
+                            html.P(
+                                "Plane",
+                                style={"lineHeight": "0.65em", "fontSize": "0.65em"},
+                            ),
+                            id="open-plane",
+                            style={"width": "5em", "height": "1.2em", "marginLeft": "0.5em"},
+                            n_clicks=0,
+                        ),
                     ],
                     justify="center",
                     style={"textAlign": "center"},
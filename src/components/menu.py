@@ -1,4 +1,4 @@
-from dash import html, dcc
+from dash import html, dcc, dash_table
 import dash_bootstrap_components as dbc
 
 # I/O
@@ -11,9 +11,6 @@ import json
 MODELS = json.load(open("../src/models/model_list.json"))
 MODELS = [{'label': model['label'], 'value': model['value']} for model in MODELS]
 
-# > Used for giving out high computation time warning
-ATOM_LIMIT = 200
-
 """
 Button for opening Upload Sidebar
 """
@@ -30,14 +27,29 @@ button = dbc.Button(
 """
 Structure of Table showing uploaded atoms
 """
-# List of ASE-atoms table
-table_header = [
-    html.Thead(
-        html.Tr([html.Th("ID"), html.Th("X"), html.Th("Y"), html.Th("Z")]),
-    )
-]  # , html.Th("Use to run MALA")
-table_body = [html.Tbody([], id="atoms_list")]
-atoms_table = dbc.Table(table_header + table_body, bordered=True)
+# List of ASE-atoms table - pages, sorting and filters are served from the server (see update_atoms_table),
+# so the table costs the same for any number of atoms
+atoms_table = dash_table.DataTable(
+    id="atoms_list",
+    columns=[
+        {"name": "ID", "id": "index", "type": "numeric"},
+        {"name": "Element", "id": "symbol", "type": "text"},
+        {"name": "X", "id": "x", "type": "numeric"},
+        {"name": "Y", "id": "y", "type": "numeric"},
+        {"name": "Z", "id": "z", "type": "numeric"},
+    ],
+    data=[],
+    page_current=0,
+    page_size=10,
+    page_count=1,
+    page_action="custom",
+    sort_action="custom",
+    sort_mode="multi",
+    sort_by=[],
+    filter_action="custom",
+    filter_query="",
+    style_cell={"fontSize": "0.85em", "textAlign": "left"},
+)
 
 """
 Popup-Modal on accepted file-session
@@ -50,6 +62,27 @@ inference_modal = dbc.Modal(
             [
                 html.H6("The uploaded File contained the following atoms positions: "),
                 html.Br(),
+                # trajectories: the frame to run MALA on (frames are indexed in the background)
+                dbc.InputGroup(
+                    [
+                        dbc.InputGroupText("Frame"),
+                        dbc.Input(id="frame-choice", type="number", min=0, max=0, step=1, value=0),
+                        dbc.InputGroupText("of 1", id="frame-count"),
+                    ],
+                    size="sm",
+                    style={"width": "20rem", "marginBottom": "0.5rem"},
+                ),
+                dcc.Interval(id="frame-index-poll", interval=500, disabled=True),
+                # batch inference of many frames (with the model chosen below), energies per frame show in the footer
+                dbc.InputGroup(
+                    [
+                        dbc.Input(id="batch-frames", placeholder="Frames, f.e. 0:1000:10 (all if empty)"),
+                        dbc.Button("Run batch", id="run-batch", n_clicks=0, color="success", outline=True),
+                    ],
+                    size="sm",
+                    style={"width": "20rem"},
+                ),
+                html.Div(id="batch-status", style={"fontSize": "0.85em", "marginBottom": "0.5rem"}),
                 dbc.Card(
                     html.H6(
                         children=[
@@ -112,17 +145,18 @@ inference_modal = dbc.Modal(
                     className="g-1",
                 ),
                 html.Br(),
+                # estimated run time / memory of the inference for the chosen model
                 dbc.Alert(
-                    id="atom-limit-warning",
-                    children="The amount of Atoms you want to display exceeds our threshold ("
-                    + str(ATOM_LIMIT)
-                    + ") for short render times. Be aware that continuing with the uploaded data may negatively impact waiting times.",
-                    color="warning",
+                    id="cost-estimate",
+                    color="info",
+                    is_open=False,
                 ),
-                # only to be displayed if ATOM_LIMIT is exceeded (maybe as an alert window too)
             ]
         ),
-        dbc.ModalFooter(
+        dbc.ModalFooter([
+            # handle of the running inference job, polled until the result is there
+            dcc.Store(id="inference_job"),
+            dcc.Interval(id="job-poll", interval=1000, disabled=True),
             dbc.Button(
                 id="run-mala",
                 style={"width": "min-content"},
@@ -148,6 +182,8 @@ inference_modal = dbc.Modal(
                 color="success",
                 outline=True,
             ),
+            html.Div(id="inference-status", style={"width": "100%", "textAlign": "center", "fontSize": "0.85em"}),
+        ],
             style={"justifyContent": "center"},
         ),
     ],
@@ -0,0 +1,43 @@
+from dash import html, dcc
+import dash_bootstrap_components as dbc
+
+"""
+2D view of a single lattice plane, rendered on the server as image
+"""
+plane_view = dbc.Collapse(
+    dbc.Card(
+        dbc.CardBody(
+            [
+                dbc.RadioItems(
+                    options=[
+                        {"label": "a", "value": 0},
+                        {"label": "b", "value": 1},
+                        {"label": "c", "value": 2},
+                    ],
+                    value=2,
+                    id="plane-axis",
+                    inline=True,
+                    style={"fontSize": "0.85em"},
+                ),
+                html.Img(
+                    id="plane-image",
+                    style={"width": "100%"},
+                ),
+                dcc.Slider(
+                    0,
+                    1,
+                    1,
+                    value=0,
+                    id="plane-index",
+                    marks=None,
+                    updatemode="drag",
+                ),
+                html.P(id="plane-label", style={"fontSize": "0.85em", "textAlign": "center"}),
+            ]
+        ),
+        style={"width": "20vw", "backgroundColor": "#f8f9fa"},
+    ),
+    id="plane-collapse",
+    is_open=False,
+    dimension="width",
+)
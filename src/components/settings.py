@@ -1,6 +1,10 @@
 from dash import html, dcc
 import dash_bootstrap_components as dbc
 
+# CONSTANTS
+# Copies of the cell the plot may show along each lattice vector (the repeated cells share the point budget)
+MAX_REPEAT = 4
+
 """
 Button for opening settings sidebar
 """
@@ -56,6 +60,38 @@ sidebar = html.Div(
                         size="sm",
                     ),
                     html.Hr(),
+                    html.H6("Render", style={"fontSize": "0.95em"}),
+                    dbc.RadioItems(
+                        options=[
+                            {"label": "Points", "value": "scatter"},
+                            {"label": "Volume", "value": "volume"},
+                            {"label": "Isosurf.", "value": "isosurface"},
+                            {"label": "Orthosl.", "value": "orthoslice"},
+                        ],
+                        value="scatter",
+                        id="render-mode",
+                        style={"textAlign": "left", "fontSize": "0.85em"},
+                    ),
+                    html.Hr(),
+                    # periodic repetition of the cell along a, b and c (display only, the density is not recomputed)
+                    html.H6("Repeat", style={"fontSize": "0.95em"}),
+                    html.Div(
+                        [
+                            dbc.Input(
+                                type="number",
+                                min=1,
+                                max=MAX_REPEAT,
+                                step=1,
+                                value=1,
+                                id=f"repeat-{axis}",
+                                size="sm",
+                                style={"width": "2.6em", "padding": "0.1em"},
+                            )
+                            for axis in "abc"
+                        ],
+                        style={"display": "flex", "justifyContent": "center", "gap": "0.2em"},
+                    ),
+                    html.Hr(),
                     dbc.Checkbox(
                         label="Outline",
                         value=True,
@@ -86,8 +122,34 @@ sidebar = html.Div(
                             vertical=True,
                             verticalHeight=150,
                         ),
+                        id="size-container",
                         style={"marginLeft": "1.2em"},
                     ),
+                    # replaces the size slider in volume/isosurface mode: isovalue as fraction of the density range
+                    html.Div(
+                        dcc.Slider(
+                            0,
+                            1,
+                            0.05,
+                            value=0.5,
+                            id="isovalue",
+                            marks=None,
+                            vertical=True,
+                            verticalHeight=150,
+                            tooltip={"placement": "left"},
+                        ),
+                        id="isovalue-container",
+                        style={"marginLeft": "1.2em", "display": "none"},
+                    ),
+                    # replaces the size slider in orthoslice mode: grid index of the a, b and c plane
+                    html.Div(
+                        [
+                            dcc.Slider(0, 1, 1, value=0, id=f"ortho-{axis}", marks=None, updatemode="drag")
+                            for axis in "abc"
+                        ],
+                        id="ortho-container",
+                        style={"display": "none"},
+                    ),
                     html.Hr(),
                     html.H6("Opacity", id="opac-label", style={"fontSize": "0.95em"}),
                     dbc.Input(
@@ -57,7 +57,7 @@ plot_tools = dbc.Collapse(
                         dbc.Col(
                             [
                                 # TODO: Triggers need work
-                                # TODO: rangesliders are only optimized with the example cell used in current models. Differently sheared planes will mess things up, as will cells with bigger datasets (minimum slice will grow/shrink)
+                                # x/y/z sliders select ranges of grid layers along the lattice axes (index space)
                                 dbc.Row(
                                     [
                                         dbc.Col(
@@ -68,7 +68,7 @@ plot_tools = dbc.Collapse(
                                                 max=1,
                                                 # step=None,
                                                 marks=None,
-                                                pushable=10,  # the sheared plane needs a range of values to be able to slice down to approx. 1 layer
+                                                pushable=0,
                                                 updatemode="drag",
                                             )
                                         ),
@@ -0,0 +1,236 @@
+"""Cost estimation and admission control for MALA inferences."""
+import json
+import threading
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+# Rough defaults used until runs of a model have been recorded
+DEFAULT_POINTS_PER_VOLUME = 200  # grid points per Å³
+DEFAULT_SECONDS_PER_POINT = 5e-3
+DEFAULT_BASE_MEMORY = 500 * 1024**2  # bytes
+DEFAULT_MEMORY_PER_POINT = 20 * 1024  # bytes
+
+
+class CostEstimator:
+    """
+    Predicts wall time and peak memory of an inference.
+
+    Every finished inference is appended to a JSON-lines log, as is every
+    total energy computed afterwards from an inference's LDOS (kind
+    "total_energy"). Estimates for a model are fitted to its recorded runs of the same kind (linear in grid points and atoms, at
+    least 3 runs needed; scaled per grid point for fewer runs) and fall back to
+    rough defaults otherwise. The grid size of a structure is estimated from
+    its cell volume and the grid density of previous runs of the same model.
+
+    Parameters
+    ----------
+    log_path : string
+        JSON-lines file the runs are recorded in.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = Path(log_path)
+        self._runs = None
+        self._lock = threading.Lock()
+
+    def estimate(self, model, n_atoms, volume, calc_total_energy=True, kind="inference"):
+        """
+        Estimate the cost of an inference.
+
+        Parameters
+        ----------
+        model : string
+            Model name, f.e. "Be|298".
+
+        n_atoms : int
+            Number of atoms of the structure.
+
+        volume : float
+            Cell volume in Å³.
+
+        calc_total_energy : bool
+            Whether the total energy is calculated as well (inferences only).
+
+        kind : string
+            "inference", or "total_energy" for computing the total energy from the LDOS of an inference.
+            Without recorded total energy runs, the full inference (with total energy) is the upper bound.
+
+        Returns
+        -------
+        estimate : dict
+            "time": wall time in seconds, "memory": peak memory in bytes,
+            "grid_points": estimated number of grid points, "calibrated": number of runs the estimate is based on.
+        """
+        runs = [
+            run
+            for run in self._load()
+            if run["model"] == model
+            and run.get("kind", "inference") == kind
+            and (kind != "inference" or run["calc_total_energy"] == calc_total_energy)
+        ]
+        if not runs and kind != "inference":
+            return dict(self.estimate(model, n_atoms, volume), kind=kind)
+        if not runs and not calc_total_energy:
+            # skipping the total energy never costs more - the full runs (batch frames) are an upper bound
+            return dict(self.estimate(model, n_atoms, volume), calc_total_energy=False)
+
+        points_per_volume = (
+            np.median([run["grid_points"] / run["volume"] for run in runs])
+            if runs
+            else DEFAULT_POINTS_PER_VOLUME
+        )
+        grid_points = max(1.0, points_per_volume * volume)
+
+        features = np.array([1.0, grid_points, n_atoms])
+        if len(runs) >= 3:
+            x = np.array([[1.0, run["grid_points"], run["n_atoms"]] for run in runs])
+            time = self._fit(x, [run["time"] for run in runs]) @ features
+            memory = self._fit(x, [run["memory"] for run in runs]) @ features
+        elif runs:
+            time = grid_points * np.mean([run["time"] / run["grid_points"] for run in runs])
+            memory = max(run["memory"] for run in runs)
+        else:
+            time = grid_points * DEFAULT_SECONDS_PER_POINT
+            memory = DEFAULT_BASE_MEMORY + grid_points * DEFAULT_MEMORY_PER_POINT
+
+        # a fit can extrapolate below anything ever measured
+        if runs:
+            time = max(time, min(run["time"] for run in runs))
+            memory = max(memory, min(run["memory"] for run in runs))
+        return {
+            "time": float(time),
+            "memory": float(memory),
+            "grid_points": int(grid_points),
+            "calibrated": len(runs),
+            "calc_total_energy": calc_total_energy,
+            "kind": kind,
+        }
+
+    def record(self, model, n_atoms, volume, grid_points, time, memory, calc_total_energy=True, kind="inference"):
+        """
+        Record a finished inference (see `estimate` for the parameters).
+        """
+        run = {
+            "model": model,
+            "n_atoms": int(n_atoms),
+            "volume": float(volume),
+            "grid_points": int(grid_points),
+            "time": float(time),
+            "memory": float(memory),
+            "calc_total_energy": bool(calc_total_energy),
+            "kind": kind,
+        }
+        with self._lock:
+            self._load_locked().append(run)
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(run) + "\n")
+
+    def _load(self):
+        with self._lock:
+            return list(self._load_locked())
+
+    def _load_locked(self):
+        if self._runs is None:
+            self._runs = []
+            if self.log_path.exists():
+                with open(self.log_path) as f:
+                    self._runs = [json.loads(line) for line in f if line.strip()]
+        return self._runs
+
+    @staticmethod
+    def _fit(x, y):
+        coefficients, *_ = np.linalg.lstsq(x, np.asarray(y), rcond=None)
+        return coefficients
+
+
+class AdmissionController:
+    """
+    Decides whether an inference may run, based on its estimated cost.
+
+    Decisions (see `decide`):
+        "run": fits into the budget right now,
+        "queue": fits, but only after running jobs have finished - held back until then,
+        "reject": doesn't fit at all.
+
+    Parameters
+    ----------
+    jobs : src.utils.inference_jobs.JobQueue
+        Queue admitted jobs are submitted to.
+
+    memory_budget : float
+        Bytes all concurrently running inferences may use together.
+
+    max_time : float
+        Longest accepted (estimated) wall time of a single inference in seconds.
+    """
+
+    def __init__(self, jobs, memory_budget, max_time):
+        self.jobs = jobs
+        self.memory_budget = memory_budget
+        self.max_time = max_time
+        self._running = {}
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def decide(self, estimate):
+        """
+        Decision for an inference.
+
+        Parameters
+        ----------
+        estimate : dict
+            CostEstimator.estimate of the inference.
+
+        Returns
+        -------
+        decision : string
+            "run", "queue" or "reject"
+        """
+        if estimate["memory"] > self.memory_budget or estimate["time"] > self.max_time:
+            return "reject"
+        with self._lock:
+            busy = self._committed_memory() + estimate["memory"] > self.memory_budget
+            busy = busy or len(self._running) >= self.jobs.workers or len(self._pending) > 0
+        return "queue" if busy else "run"
+
+    def submit(self, session_id, fn, kwargs, estimate):
+        """
+        Submit a job to the JobQueue as soon as the budget allows for its estimate.
+
+        Returns
+        -------
+        job : dict
+            Handle of the job, see JobQueue.submit - it reports "queued" while held back.
+        """
+        job = self.jobs.reserve(session_id)
+        with self._lock:
+            self._pending.append((job, fn, kwargs, estimate))
+        self._dispatch()
+        return job
+
+    def _committed_memory(self):
+        return sum(estimate["memory"] for estimate in self._running.values())
+
+    def _dispatch(self):
+        with self._lock:
+            ready = []
+            while self._pending:
+                job, fn, kwargs, estimate = self._pending[0]
+                if self._running and (
+                    self._committed_memory() + estimate["memory"] > self.memory_budget
+                    or len(self._running) >= self.jobs.workers
+                ):
+                    break
+                self._pending.popleft()
+                self._running[job["ID"]] = estimate
+                ready.append((job, fn, kwargs))
+        for job, fn, kwargs in ready:
+            self.jobs.submit(job["SESSION"], fn, kwargs, job=job, callback=self._release)
+
+    def _release(self, job):
+        with self._lock:
+            self._running.pop(job["ID"], None)
+        self._dispatch()
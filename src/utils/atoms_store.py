@@ -0,0 +1,126 @@
+"""Server-side store for uploaded structures, so the browser only holds a handle to them."""
+import hashlib
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import ase
+import numpy as np
+
+
+class AtomsStore:
+    """
+    Per-session store for uploaded atoms, keyed by a hash of their content.
+
+    Only what an inference needs (atomic numbers, positions, cell and pbc) is
+    kept, as compact NumPy arrays in "<root>/<session_id>/atoms/<key>.npz".
+    The most recently used structures are also kept in memory. The browser
+    receives a handle (see `put`) with the key and a short summary.
+
+    Parameters
+    ----------
+    root : string
+        Folder containing the session folders (the dash-uploader folder).
+
+    max_entries : int
+        Number of structures kept in memory at the same time.
+    """
+
+    FOLDER_NAME = "atoms"
+
+    def __init__(self, root, max_entries=32):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def arrays(atoms):
+        """
+        The arrays a structure is stored as.
+        """
+        return {
+            "numbers": np.asarray(atoms.get_atomic_numbers(), dtype="<i8"),
+            "positions": np.asarray(atoms.get_positions(), dtype="<f8"),
+            "cell": np.asarray(atoms.get_cell(), dtype="<f8"),
+            "pbc": np.asarray(atoms.get_pbc(), dtype=bool),
+        }
+
+    @staticmethod
+    def key(arrays):
+        """
+        Hex digest (sha256) of the arrays of a structure.
+        """
+        digest = hashlib.sha256()
+        for name in ["numbers", "positions", "cell", "pbc"]:
+            digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+        return digest.hexdigest()
+
+    def put(self, session_id, atoms):
+        """
+        Store a structure for a session and return the handle for the browser.
+
+        Parameters
+        ----------
+        session_id : string
+            Upload ID of the session.
+
+        atoms : ase.Atoms
+            Uploaded structure.
+
+        Returns
+        -------
+        handle : dict
+            "KEY": hash of the structure, "N_ATOMS": number of atoms, "FORMULA": chemical formula.
+        """
+        arrays = self.arrays(atoms)
+        key = self.key(arrays)
+        path = self.root / session_id / self.FOLDER_NAME / f"{key}.npz"
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(path, **arrays)
+        with self._lock:
+            self._remember((session_id, key), arrays)
+        return {"KEY": key, "N_ATOMS": len(atoms), "FORMULA": atoms.get_chemical_formula()}
+
+    def get(self, session_id, handle):
+        """
+        Resolve a handle (as returned by `put`) to a new ase.Atoms.
+
+        Returns None if the handle is empty or the structure is no longer available.
+        """
+        if handle is None:
+            return None
+        entry = (session_id, handle["KEY"])
+        with self._lock:
+            arrays = self._entries.get(entry)
+            if arrays is not None:
+                self._entries.move_to_end(entry)
+        if arrays is None:
+            path = self.root / session_id / self.FOLDER_NAME / f"{handle['KEY']}.npz"
+            try:
+                with np.load(path) as stored:
+                    arrays = {name: stored[name] for name in stored.files}
+            except FileNotFoundError:
+                return None
+            with self._lock:
+                self._remember(entry, arrays)
+        return ase.Atoms(
+            numbers=arrays["numbers"], positions=arrays["positions"], cell=arrays["cell"], pbc=arrays["pbc"]
+        )
+
+    def drop(self, session_id):
+        """
+        Remove all structures of a session from memory and disk.
+        """
+        with self._lock:
+            for entry in [entry for entry in self._entries if entry[0] == session_id]:
+                del self._entries[entry]
+        shutil.rmtree(self.root / session_id / self.FOLDER_NAME, ignore_errors=True)
+
+    def _remember(self, entry, arrays):
+        self._entries[entry] = arrays
+        self._entries.move_to_end(entry)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
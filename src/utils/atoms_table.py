@@ -0,0 +1,139 @@
+"""Paging, sorting and filtering of the atoms table on the server (DataTable with custom page/sort/filter actions)."""
+import numpy as np
+
+# DataTable filter operators (as written in the filter row) and their NumPy comparison
+OPERATORS = {
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+    "!=": np.not_equal,
+    ">": np.greater,
+    "<": np.less,
+    "=": np.equal,
+    "ge": np.greater_equal,
+    "le": np.less_equal,
+    "ne": np.not_equal,
+    "gt": np.greater,
+    "lt": np.less,
+    "eq": np.equal,
+}
+
+
+def atom_columns(atoms):
+    """
+    Columns of the atoms table ("index", "symbol", "x", "y", "z") as NumPy arrays.
+    """
+    positions = atoms.get_positions()
+    return {
+        "index": np.arange(len(atoms)),
+        "symbol": np.asarray(atoms.get_chemical_symbols()),
+        "x": positions[:, 0],
+        "y": positions[:, 1],
+        "z": positions[:, 2],
+    }
+
+
+def _split_filter_part(part):
+    # "{x} > 2" -> ("x", ">", "2"), "{symbol} contains A" -> ("symbol", "contains", "A")
+    part = part.strip()
+    if not part.startswith("{") or "}" not in part:
+        raise ValueError(f"unsupported filter: {part}")
+    name, rest = part[1:].split("}", 1)
+    rest = rest.strip()
+    for operator in ["contains", "datestartswith"] + list(OPERATORS):
+        if rest.startswith(operator):
+            value = rest[len(operator):].strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'`":
+                value = value[1:-1]
+            return name, operator, value
+    raise ValueError(f"unsupported filter: {part}")
+
+
+def filter_mask(columns, query):
+    """
+    Rows matching a DataTable filter query (f.e. "{symbol} = Al && {z} > 2.5").
+
+    Parameters
+    ----------
+    columns : dict
+        As returned by atom_columns.
+
+    query : string
+        filter_query of the DataTable, parts joined by " && ".
+
+    Returns
+    -------
+    mask : numpy.ndarray
+        Boolean mask over the rows.
+    """
+    mask = np.ones(len(columns["index"]), dtype=bool)
+    if not query:
+        return mask
+    for part in query.split(" && "):
+        name, operator, value = _split_filter_part(part)
+        column = columns[name]
+        if name == "symbol":
+            if operator in ["contains", "datestartswith"]:
+                mask &= np.char.find(column, value) >= 0
+            else:
+                mask &= OPERATORS[operator](column, value)
+            continue
+        number = float(value)
+        if operator == "contains":
+            operator = "="
+        if operator not in OPERATORS:
+            raise ValueError(f"unsupported filter: {part}")
+        mask &= OPERATORS[operator](column, number)
+    return mask
+
+
+def atoms_page(columns, page, page_size, sort_by=None, query=None):
+    """
+    One page of the filtered and sorted atoms table.
+
+    Parameters
+    ----------
+    columns : dict
+        As returned by atom_columns.
+
+    page : int
+        page_current of the DataTable.
+
+    page_size : int
+        Rows per page.
+
+    sort_by : list
+        sort_by of the DataTable ({"column_id", "direction"}, the first one sorts first).
+
+    query : string
+        filter_query of the DataTable.
+
+    Returns
+    -------
+    rows : list
+        Rows of the page as dicts (positions rounded to 4 decimals).
+
+    page_count : int
+        Number of pages of the filtered table (at least 1).
+    """
+    rows = np.flatnonzero(filter_mask(columns, query))
+    if sort_by:
+        # stable sorts from the last to the first sort column; symbols are sorted by their rank, so they can be negated
+        for sort in reversed(sort_by):
+            values = columns[sort["column_id"]][rows]
+            if values.dtype.kind == "U":
+                values = np.unique(values, return_inverse=True)[1]
+            if sort["direction"] == "desc":
+                values = -values
+            rows = rows[np.argsort(values, kind="stable")]
+    page_count = max(1, -(-len(rows) // page_size))
+    rows = rows[page * page_size:(page + 1) * page_size]
+    return [
+        {
+            "index": int(i),
+            "symbol": str(columns["symbol"][i]),
+            "x": round(float(columns["x"][i]), 4),
+            "y": round(float(columns["y"][i]), 4),
+            "z": round(float(columns["z"][i]), 4),
+        }
+        for i in rows
+    ], page_count
@@ -0,0 +1,61 @@
+"""Batch inference of trajectory frames: the job run per frame in the inference workers."""
+import numpy as np
+
+from src.utils.frames import read_frame
+from src.utils.mala_inference import run_mala_prediction
+from src.utils.result_cache import ResultCache
+from src.utils.supercell import find_supercell, reduce_supercell
+
+
+def run_frame(locator, model_and_temp, session_id, results_root, reduce_supercells=True):
+    """
+    Read one frame, look it up in the result cache and run MALA (with total energy) on it if it isn't cached.
+
+    Everything per frame happens in the worker, so submitting a batch doesn't
+    read its frames. The result is not cached here: the server caches it when
+    it collects the job (the cache is only written by the server process).
+
+    Parameters
+    ----------
+    locator : dict
+        Frame to read, see FrameIndex.locator.
+
+    model_and_temp : dict
+        "name" of the model and "temperature", as passed to run_mala_prediction.
+
+    session_id : string
+        Upload ID of the session.
+
+    results_root : string
+        Folder of the ResultCache.
+
+    reduce_supercells : bool
+        Predict supercells on their smaller cell (see supercell.find_supercell).
+
+    Returns
+    -------
+    frame : dict
+        "key": result cache key, "repeat": (n, m, k) cells the frame consists of,
+        "energies": band, total and Fermi energy of the predicted cell,
+        "results": results of run_mala_prediction, None if they were cached,
+        "n_atoms" and "volume" of the predicted cell.
+    """
+    atoms = read_frame(locator)
+    repeat = find_supercell(atoms) if reduce_supercells else (1, 1, 1)
+    if repeat != (1, 1, 1):
+        atoms = reduce_supercell(atoms, repeat)
+    key = ResultCache.key(atoms, model_and_temp)
+    energies = ResultCache(results_root).energies(key)
+    results = None
+    # not cached, or cached without total energy
+    if energies is None or np.isnan(energies["total_energy"]):
+        results = run_mala_prediction(atoms, model_and_temp, session_id, calc_total_energy=True)
+        energies = {name: float(results[name]) for name in ["band_energy", "total_energy", "fermi_energy"]}
+    return {
+        "key": key,
+        "repeat": list(repeat),
+        "energies": energies,
+        "results": results,
+        "n_atoms": len(atoms),
+        "volume": atoms.get_volume(),
+    }
@@ -0,0 +1,69 @@
+"""Coalescing of rapidly repeated requests (f.e. slider drags), so only the latest one is computed."""
+import threading
+from contextlib import contextmanager
+
+
+class RequestCoalescer:
+    """
+    Tracks the latest request per key (session) by its sequence number.
+
+    Requests of one key are computed one after another. A request that is
+    superseded by a newer one - before it starts or while it waits for its
+    turn - is dropped instead of computed, and a result that got stale while
+    it was computed is dropped instead of sent.
+
+    Usage::
+
+        if not coalescer.offer(session_id, seq):
+            raise PreventUpdate  # a newer request arrived first
+        with coalescer.turn(session_id):
+            if not coalescer.is_latest(session_id, seq):
+                raise PreventUpdate
+            ...
+    """
+
+    def __init__(self):
+        self._latest = {}
+        self._turns = {}
+        self._lock = threading.Lock()
+
+    def offer(self, key, seq):
+        """
+        Register request seq of key. False if a newer request of key is known already.
+
+        Requests without sequence number (None) are always accepted.
+        """
+        if seq is None:
+            return True
+        with self._lock:
+            if seq < self._latest.get(key, -1):
+                return False
+            self._latest[key] = seq
+            return True
+
+    def is_latest(self, key, seq):
+        """
+        False once a newer request of key has been offered.
+        """
+        if seq is None:
+            return True
+        with self._lock:
+            return seq >= self._latest.get(key, -1)
+
+    @contextmanager
+    def turn(self, key):
+        """
+        Context in which a request of key is computed, one request per key at a time.
+        """
+        with self._lock:
+            turn = self._turns.setdefault(key, threading.Lock())
+        with turn:
+            yield
+
+    def forget(self, key):
+        """
+        Drop the state of key (f.e. on reset of the session).
+        """
+        with self._lock:
+            self._latest.pop(key, None)
+            self._turns.pop(key, None)
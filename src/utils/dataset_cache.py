@@ -0,0 +1,114 @@
+"""Server-side cache for the datasets produced by a MALA inference."""
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+class DatasetCache:
+    """
+    Per-session store for the NumPy arrays of an inference.
+
+    The browser only receives a small handle (see `put`), every callback that
+    needs the actual data resolves that handle through `get`. Datasets are
+    kept in memory for the most recently used sessions and are additionally
+    written to "<root>/<session_id>/dataset.npz", so that other server
+    processes (or this one after an eviction) can reload them.
+
+    Parameters
+    ----------
+    root : string
+        Folder containing the session folders (the dash-uploader folder).
+
+    max_entries : int
+        Number of datasets kept in memory at the same time.
+    """
+
+    FILE_NAME = "dataset.npz"
+
+    def __init__(self, root, max_entries=8):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, session_id, dataset):
+        """
+        Store a dataset for a session and return the handle for the browser.
+
+        Parameters
+        ----------
+        session_id : string
+            Upload ID of the session.
+
+        dataset : dict
+            Mapping of names to NumPy arrays or scalars.
+
+        Returns
+        -------
+        handle : dict
+            "ID": session ID, "VERSION": token identifying this very dataset,
+            "SHAPE": grid dimensions of the density.
+        """
+        version = uuid.uuid4().hex
+        dataset = dict(dataset, version=version)
+        path = self.root / session_id / self.FILE_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, **dataset)
+        with self._lock:
+            self._remember(session_id, dataset)
+        return {
+            "ID": session_id,
+            "VERSION": version,
+            "SHAPE": list(np.shape(dataset["density"])),
+        }
+
+    def get(self, handle):
+        """
+        Resolve a handle (as returned by `put`) to its dataset.
+
+        Returns None if the handle is empty or the dataset is no longer available.
+        """
+        if handle is None:
+            return None
+        session_id = handle["ID"]
+        with self._lock:
+            dataset = self._entries.get(session_id)
+            if dataset is not None and dataset["version"] == handle["VERSION"]:
+                self._entries.move_to_end(session_id)
+                return dataset
+        dataset = self._load(session_id)
+        if dataset is None or dataset["version"] != handle["VERSION"]:
+            return None
+        with self._lock:
+            self._remember(session_id, dataset)
+        return dataset
+
+    def drop(self, session_id):
+        """
+        Remove the dataset of a session from memory and disk.
+        """
+        with self._lock:
+            self._entries.pop(session_id, None)
+        Path(self.root / session_id / self.FILE_NAME).unlink(missing_ok=True)
+
+    def _remember(self, session_id, dataset):
+        self._entries[session_id] = dataset
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, session_id):
+        path = self.root / session_id / self.FILE_NAME
+        try:
+            with np.load(path) as stored:
+                dataset = {key: stored[key] for key in stored.files}
+        except FileNotFoundError:
+            return None
+        # 0-d arrays back to plain scalars
+        return {
+            key: value.item() if value.ndim == 0 else value
+            for key, value in dataset.items()
+        }
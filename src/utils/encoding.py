@@ -0,0 +1,94 @@
+"""Columnar binary encoding of NumPy arrays for dcc.Stores and figure patches."""
+import base64
+
+import numpy as np
+
+# dtype names of the plotly.js typed-array spec ({"dtype": .., "bdata": .., "shape": ..}),
+# which plotly.js decodes natively when used inside a figure
+DTYPE_CODES = {
+    "float64": "f8",
+    "float32": "f4",
+    "int32": "i4",
+    "uint32": "u4",
+    "int16": "i2",
+    "uint16": "u2",
+    "int8": "i1",
+    "uint8": "u1",
+}
+CODE_DTYPES = {code: name for name, code in DTYPE_CODES.items()}
+
+
+def encode_array(array, dtype=np.float32):
+    """
+    Encode an array as base64 bytes with dtype and shape metadata.
+
+    Parameters
+    ----------
+    array : array_like
+        Data to encode.
+
+    dtype : numpy.dtype
+        Type the data is cast to before encoding. Defaults to float32, which is
+        plenty for plotting and halves the payload compared to float64.
+
+    Returns
+    -------
+    spec : dict
+        "dtype": plotly.js type code, "bdata": base64 string of the little-endian
+        bytes, "shape": comma-separated dimensions (only for multidimensional data).
+    """
+    array = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder("<"))
+    spec = {
+        "dtype": DTYPE_CODES[array.dtype.name],
+        "bdata": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+    if array.ndim > 1:
+        spec["shape"] = ",".join(map(str, array.shape))
+    return spec
+
+
+def decode_array(spec):
+    """
+    Decode an array encoded by `encode_array`. Plain lists are passed through np.asarray.
+    """
+    if not is_encoded(spec):
+        return np.asarray(spec)
+    array = np.frombuffer(
+        base64.b64decode(spec["bdata"]),
+        dtype=np.dtype(CODE_DTYPES[spec["dtype"]]).newbyteorder("<"),
+    )
+    if "shape" in spec:
+        array = array.reshape([int(n) for n in spec["shape"].split(",")])
+    return array
+
+
+def is_encoded(data):
+    """
+    True if data is an array spec as produced by `encode_array`.
+    """
+    return isinstance(data, dict) and "bdata" in data and "dtype" in data
+
+
+def encode_columns(columns, dtype=np.float32):
+    """
+    Encode a mapping of column names to arrays (f.e. unique_df) column by column.
+
+    Integer columns (f.e. point counts) stay exact: they are encoded as uint32
+    (int32 if negative), only the other columns are cast to dtype.
+    """
+    return {name: encode_array(column, _column_dtype(column, dtype)) for name, column in columns.items()}
+
+
+def _column_dtype(column, dtype):
+    column = np.asarray(column)
+    if column.dtype.kind not in "iu":
+        return dtype
+    return np.uint32 if column.size == 0 or column.min() >= 0 else np.int32
+
+
+def decode_columns(columns):
+    """
+    Decode a mapping produced by `encode_columns`. Unencoded columns are accepted as well.
+    """
+    return {name: decode_array(column) for name, column in columns.items()}
+
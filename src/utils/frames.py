@@ -0,0 +1,124 @@
+"""Index of the frames of uploaded (multi-frame) structure files, built in the background."""
+import io
+import re
+import threading
+
+import ase.io
+import numpy as np
+
+# Formats whose frames are found by scanning lines: atom count, comment, one line per atom
+LINE_FORMATS = ["xyz", "extxyz"]
+LATTICE = re.compile(r'Lattice="([^"]*)"')
+
+
+def read_frame(locator):
+    """
+    A frame as ase.Atoms, see FrameIndex.locator. xyz frames are read from their byte offset.
+    """
+    if locator["offset"] is not None:
+        with open(locator["path"], "rb") as f:
+            f.seek(locator["offset"])
+            lines = [f.readline() for _ in range(locator["n_atoms"] + 2)]
+        return ase.io.read(io.StringIO(b"".join(lines).decode()), format="extxyz")
+    return ase.io.read(locator["path"], index=locator["index"], format=locator["format"])
+
+
+class FrameIndex:
+    """
+    Frames of a structure file (f.e. an MD trajectory), indexed without keeping them in memory.
+
+    The file is streamed once in a background thread. Per frame only the
+    number of atoms and the cell are kept (and the byte offset for xyz files),
+    frames are read on demand by `frame`. Indexed frames are available while
+    the rest of the file is still being indexed.
+
+    Parameters
+    ----------
+    path : string
+        Path of the structure file.
+
+    format : string
+        ASE format of the file, guessed if None.
+    """
+
+    def __init__(self, path, format=None):
+        self.path = str(path)
+        self.format = format or ase.io.formats.filetype(self.path, guess=True)
+        self.n_atoms = []
+        self.cells = []
+        self._offsets = []
+        self.done = False
+        self.error = None
+        self._thread = None
+
+    def start(self):
+        """
+        Start indexing in a background thread (returns right away).
+        """
+        self._thread = threading.Thread(target=self._index, daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """
+        Wait until the whole file is indexed.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def __len__(self):
+        return len(self.n_atoms)
+
+    def frame(self, i):
+        """
+        Frame i as ase.Atoms, read from the file.
+        """
+        return read_frame(self.locator(i))
+
+    def locator(self, i):
+        """
+        What read_frame needs to read frame i (a small picklable dict, f.e. for worker processes).
+        """
+        if not 0 <= i < len(self):
+            raise IndexError(f"frame {i} is not indexed (yet)")
+        offset = self._offsets[i] if self.format in LINE_FORMATS else None
+        return {"path": self.path, "format": self.format, "index": i, "offset": offset, "n_atoms": self.n_atoms[i]}
+
+    def volume(self, i):
+        """
+        Cell volume of frame i in Å³ (0 for frames without a cell).
+        """
+        return float(abs(np.linalg.det(self.cells[i])))
+
+    def _index(self):
+        try:
+            if self.format in LINE_FORMATS:
+                self._index_lines()
+            else:
+                for atoms in ase.io.iread(self.path, index=":", format=self.format):
+                    self.cells.append(np.asarray(atoms.cell, dtype=np.float64))
+                    self.n_atoms.append(len(atoms))
+        except Exception as error:  # the frames indexed so far stay usable
+            self.error = error
+        self.done = True
+
+    def _index_lines(self):
+        # atom count line, comment line (extxyz: holds the lattice), then one line per atom
+        with open(self.path, "rb") as f:
+            while True:
+                offset = f.tell()
+                count = f.readline()
+                if not count.strip():
+                    break
+                n_atoms = int(count)
+                comment = f.readline().decode(errors="replace")
+                for _ in range(n_atoms):
+                    f.readline()
+                lattice = LATTICE.search(comment)
+                cell = np.zeros((3, 3))
+                if lattice is not None:
+                    cell = np.array(lattice.group(1).split(), dtype=np.float64).reshape(3, 3)
+                self.cells.append(cell)
+                self._offsets.append(offset)
+                # appended last: the frame counts as indexed once everything about it is there
+                self.n_atoms.append(n_atoms)
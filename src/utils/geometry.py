@@ -0,0 +1,226 @@
+"""Transformations between grid indices, lattice and Cartesian coordinates."""
+import itertools
+
+import numpy as np
+
+# Outlines of 4 cell planes in fractional coordinates (the other 2 are obvious by the 4 surrounding them)
+CELL_PLANES = [
+    # X-Z at the origin, X-Z shifted by Y
+    [[0, 0, 0], [1, 0, 0], [1, 0, 1], [0, 0, 1], [0, 0, 0]],
+    [[0, 1, 0], [1, 1, 0], [1, 1, 1], [0, 1, 1], [0, 1, 0]],
+    # X-Y at the origin, X-Y shifted by Z
+    [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 0]],
+    [[0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1], [0, 0, 1]],
+]
+
+
+def to_cartesian(points, basis):
+    """
+    Map points given in a (sheared) basis to Cartesian coordinates.
+
+    Parameters
+    ----------
+    points : array_like
+        (..., 3) array of coordinates in units of the basis vectors, f.e. grid
+        indices (basis = voxel) or fractional coordinates (basis = cell).
+
+    basis : array_like
+        (3, 3) array, one basis vector per row (like mala_data["voxel"] or atoms.cell).
+
+    Returns
+    -------
+    cartesian : numpy.ndarray
+        (..., 3) float32 array of Cartesian coordinates.
+    """
+    # ase.cell.Cell only converts to float64 arrays
+    return np.asarray(points, dtype=np.float32) @ np.asarray(basis, dtype=np.float64).astype(np.float32)
+
+
+def grid_coordinates(shape, voxel):
+    """
+    Cartesian coordinates of every point of a grid.
+
+    Parameters
+    ----------
+    shape : tuple
+        Grid dimensions (nx, ny, nz).
+
+    voxel : array_like
+        (3, 3) array of the voxel vectors, one per row.
+
+    Returns
+    -------
+    coordinates : numpy.ndarray
+        (nx, ny, nz, 3) float32 array, coordinates[i, j, k] is the position of grid point (i, j, k).
+    """
+    shape = tuple(shape)
+    indices = np.indices(shape, dtype=np.float32).reshape(3, -1).T
+    return to_cartesian(indices, voxel).reshape(shape + (3,))
+
+
+def cell_planes(cell):
+    """
+    Cartesian outlines of 4 planes of the cell (see CELL_PLANES).
+
+    Returns
+    -------
+    planes : list
+        One (5, 3) float32 array per plane (closed paths).
+    """
+    return [to_cartesian(plane, cell) for plane in CELL_PLANES]
+
+
+def cell_outline(cell):
+    """
+    The outlines of cell_planes as one path, for drawing the cell with a single line trace.
+
+    Returns
+    -------
+    outline : numpy.ndarray
+        (23, 3) float32 array, the 4 closed plane outlines separated by NaN rows (plotly breaks lines at gaps).
+    """
+    planes = cell_planes(cell)
+    gap = np.full((1, 3), np.nan, dtype=np.float32)
+    return np.concatenate([part for plane in planes for part in (plane, gap)][:-1])
+
+
+def stratified_sample(scaled_positions, n, bins=None, seed=0):
+    """
+    Indices of at most n points, spread evenly over space.
+
+    The unit cube is divided into bins x bins x bins boxes and points are taken
+    round-robin from all boxes (randomly within a box), so sparse regions
+    keep their points and dense ones are thinned out.
+
+    Parameters
+    ----------
+    scaled_positions : array_like
+        (N, 3) coordinates between 0 and 1, f.e. atoms.get_scaled_positions(wrap=True).
+
+    n : int
+        Number of points to keep.
+
+    bins : int
+        Boxes along each cell vector, defaults to about one box per point kept.
+
+    seed : int
+        Seed of the random choice within the boxes (so the same points are picked every time).
+
+    Returns
+    -------
+    indices : numpy.ndarray
+        Sorted indices of the chosen points (all of them if there are at most n).
+    """
+    scaled_positions = np.asarray(scaled_positions)
+    if len(scaled_positions) <= n:
+        return np.arange(len(scaled_positions))
+    bins = bins or max(1, int(round(n ** (1 / 3))))
+    box = np.clip(np.floor(scaled_positions * bins).astype(np.int64), 0, bins - 1)
+    box = np.ravel_multi_index(box.T, (bins, bins, bins))
+    # random order, then grouped by box: the rank within its box decides when a point is taken
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(box))
+    order = order[np.argsort(box[order], kind="stable")]
+    sorted_box = box[order]
+    first = np.flatnonzero(np.r_[True, sorted_box[1:] != sorted_box[:-1]])
+    rank = np.arange(len(order)) - np.repeat(first, np.diff(np.r_[first, len(order)]))
+    # the boxes of a round in random order, so the last (partial) round isn't taken from the low corner first
+    priority = rng.permutation(bins**3)[sorted_box]
+    return np.sort(order[np.lexsort((priority, rank))[:n]])
+
+
+def tile_offsets(cell, repeat):
+    """
+    Translations of the copies of a cell repeated n x m x k times (the first one is the cell itself).
+
+    Parameters
+    ----------
+    cell : array_like
+        (3, 3) array of the cell vectors, one per row.
+
+    repeat : sequence
+        Number of copies (n, m, k) along the cell vectors, None for a single cell.
+
+    Returns
+    -------
+    offsets : numpy.ndarray
+        (n * m * k, 3) float32 array of Cartesian translations.
+    """
+    repeat = repeat or (1, 1, 1)
+    return to_cartesian(list(itertools.product(*[range(max(1, int(n))) for n in repeat])), cell)
+
+
+def tile_points(points, offsets):
+    """
+    Copies of points translated by every offset (see tile_offsets), copy after copy.
+
+    Returns
+    -------
+    tiled : numpy.ndarray
+        (len(offsets) * len(points), 3) float32 array.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    return (offsets[:, None, :] + points[None, :, :]).reshape(-1, 3)
+
+
+def resample_cartesian(density, voxel, resolution, outside=None, repeat=None):
+    """
+    Resample a (sheared) periodic grid onto a regular Cartesian grid spanning the cell's bounding box.
+
+    Needed for go.Volume / go.Isosurface, which expect axis-aligned grids.
+    Values are interpolated trilinearly (periodic across the cell faces).
+
+    Parameters
+    ----------
+    density : numpy.ndarray
+        (nx, ny, nz) grid values.
+
+    voxel : array_like
+        (3, 3) array of the voxel vectors, one per row.
+
+    resolution : int
+        Number of points along the longest axis of the bounding box, the others get the same spacing.
+
+    outside : float
+        Value of the points of the box outside the cell, defaults to the minimum of the density.
+
+    repeat : sequence
+        Number of copies (n, m, k) of the cell to span, None for a single cell. The
+        resolution stays the same, so repeated cells are sampled more coarsely.
+
+    Returns
+    -------
+    axes : list
+        One 1D float32 array of coordinates per Cartesian axis.
+
+    values : numpy.ndarray
+        (len(axes[0]), len(axes[1]), len(axes[2])) float32 array of the resampled values.
+    """
+    density = np.asarray(density)
+    shape = np.array(density.shape)
+    extent = shape * np.maximum(1, np.asarray(repeat or (1, 1, 1), dtype=int))
+    voxel = np.asarray(voxel, dtype=np.float64)
+    corners = np.array(list(itertools.product([0, 1], repeat=3))) * extent @ voxel
+    low, high = corners.min(axis=0), corners.max(axis=0)
+    spacing = (high - low).max() / max(1, resolution - 1)
+    axes = [
+        np.linspace(low[i], high[i], max(2, int(round((high[i] - low[i]) / spacing)) + 1))
+        for i in range(3)
+    ]
+    points = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    # continuous grid indices of the points
+    indices = points @ np.linalg.inv(voxel)
+    inside = np.all((indices >= -1e-6) & (indices <= extent + 1e-6), axis=1)
+
+    base = np.floor(indices).astype(int)
+    weights = indices - base
+    values = np.zeros(len(points))
+    for offset in itertools.product([0, 1], repeat=3):
+        corner = (base + offset) % shape
+        weight = np.prod(np.where(offset, weights, 1 - weights), axis=1)
+        values += weight * density[corner[:, 0], corner[:, 1], corner[:, 2]]
+    values[~inside] = density.min() if outside is None else outside
+
+    shape = tuple(len(axis) for axis in axes)
+    return [axis.astype(np.float32) for axis in axes], values.reshape(shape).astype(np.float32)
@@ -0,0 +1,197 @@
+"""Background execution of MALA inferences in a pool of worker processes."""
+import json
+import multiprocessing
+import os
+import pickle
+import resource
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+
+class JobQueue:
+    """
+    Runs long jobs (inferences) in local worker processes, outside of the Dash requests.
+
+    Submitting returns a small handle for a dcc.Store, which callbacks poll via
+    `status` and `result`. The queue itself lives in memory (the executor), job
+    states and results are files in "<root>/<session_id>/jobs/", so any server
+    process can answer the polls.
+
+    Parameters
+    ----------
+    root : string
+        Folder containing the session folders (the dash-uploader folder).
+
+    workers : int
+        Number of worker processes.
+
+    initializer : callable
+        Called without arguments in every worker process on startup (f.e. for preloading models).
+    """
+
+    def __init__(self, root, workers=1, initializer=None):
+        self.root = Path(root)
+        self.workers = workers
+        self.initializer = initializer
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the worker processes. Done automatically on the first submit.
+        """
+        with self._lock:
+            if self._executor is None:
+                # workers are forked, so they don't re-run the app module on startup
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=self.initializer,
+                )
+                # spawn all workers right away, so their initializer runs now and not on the first job
+                for _ in range(self.workers):
+                    self._executor.submit(time.sleep, 0)
+            return self._executor
+
+    def reserve(self, session_id):
+        """
+        Create the handle of a job that will be submitted later. It reports "queued" until then.
+
+        Returns
+        -------
+        job : dict
+            "ID": job ID, "SESSION": session ID, "SUBMITTED": submission time (epoch seconds)
+        """
+        job = {"ID": uuid.uuid4().hex, "SESSION": session_id, "SUBMITTED": time.time()}
+        job_dir = self._job_dir(job)
+        job_dir.mkdir(parents=True, exist_ok=True)
+        (job_dir / f"{job['ID']}.queued").touch()
+        return job
+
+    def submit(self, session_id, fn, kwargs, job=None, callback=None):
+        """
+        Queue fn(**kwargs) for execution in a worker process.
+
+        Parameters
+        ----------
+        session_id : string
+            Upload ID of the session the job belongs to.
+
+        fn : callable
+            Picklable (module level) function to run.
+
+        kwargs : dict
+            Keyword arguments for fn, picklable as well.
+
+        job : dict
+            Handle created by `reserve`, None to create a new one.
+
+        callback : callable
+            Called with the job handle (in this process) once the job finished.
+
+        Returns
+        -------
+        job : dict
+            "ID": job ID, "SESSION": session ID, "SUBMITTED": submission time (epoch seconds)
+        """
+        if job is None:
+            job = self.reserve(session_id)
+        future = self.start().submit(_execute, str(self._job_dir(job)), job["ID"], fn, kwargs)
+        if callback is not None:
+            future.add_done_callback(lambda _: callback(job))
+        return job
+
+    def status(self, job):
+        """
+        State of a job: "queued", "running", "done", "failed" or "unknown" (f.e. after a server restart).
+        """
+        job_dir = self._job_dir(job)
+        for state in ["done", "failed", "running", "queued"]:
+            if (job_dir / f"{job['ID']}.{state}").exists():
+                return state
+        return "unknown"
+
+    def result(self, job, remove=True):
+        """
+        Return value of a finished job.
+
+        Raises
+        ------
+        RuntimeError
+            If the job failed, with the traceback of the worker as message.
+        """
+        job_dir = self._job_dir(job)
+        if self.status(job) == "failed":
+            path = job_dir / f"{job['ID']}.failed"
+            message = path.read_text()
+            if remove:
+                path.unlink(missing_ok=True)
+            raise RuntimeError(message)
+        path = job_dir / f"{job['ID']}.done"
+        with open(path, "rb") as f:
+            result = pickle.load(f)
+        if remove:
+            path.unlink(missing_ok=True)
+        return result
+
+    def stats(self, job):
+        """
+        Measurements of a finished job: "time" (wall time in seconds) and
+        "memory" (peak resident memory of its worker process in bytes), None if not available.
+        """
+        path = self._job_dir(job) / f"{job['ID']}.stats"
+        try:
+            stats = json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        path.unlink(missing_ok=True)
+        return stats
+
+    def shutdown(self):
+        """
+        Stop the worker processes after their current jobs.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _job_dir(self, job):
+        return self.root / job["SESSION"] / "jobs"
+
+
+def _execute(job_dir, job_id, fn, kwargs):
+    """
+    Run a job inside a worker process and record its state and result in job_dir.
+    """
+    job_dir = Path(job_dir)
+    queued = job_dir / f"{job_id}.queued"
+    running = job_dir / f"{job_id}.running"
+    if queued.exists():
+        queued.rename(running)
+    start = time.perf_counter()
+    try:
+        result = fn(**kwargs)
+        stats = {
+            "time": time.perf_counter() - start,
+            # peak of the whole worker lifetime, an upper bound for this job
+            "memory": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        }
+        (job_dir / f"{job_id}.stats").write_text(json.dumps(stats))
+    except Exception:
+        _write_atomic(job_dir / f"{job_id}.failed", traceback.format_exc().encode())
+    else:
+        _write_atomic(job_dir / f"{job_id}.done", pickle.dumps(result))
+    finally:
+        running.unlink(missing_ok=True)
+
+
+def _write_atomic(path, data):
+    # pollers must never see a half written file
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
@@ -0,0 +1,224 @@
+"""Isosurface extraction (marching tetrahedra) on periodic grids, with decimation and an LRU cache of meshes."""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.geometry import to_cartesian
+from src.utils.pyramid import block_average
+
+# Corners of a grid cube, corner c is at offset (c & 1, c >> 1 & 1, c >> 2 & 1)
+CUBE_CORNERS = np.array([[c & 1, c >> 1 & 1, c >> 2 & 1] for c in range(8)])
+# Split of a cube into 6 tetrahedra along its main diagonal (0-7), matching on shared faces of neighbouring cubes
+CUBE_TETRAHEDRA = np.array(
+    [[0, 1, 3, 7], [0, 2, 3, 7], [0, 2, 6, 7], [0, 4, 6, 7], [0, 4, 5, 7], [0, 1, 5, 7]]
+)
+
+
+def _tetrahedron_tables():
+    # for every combination of corners above the isovalue (bit i = corner i):
+    # one triangle: lone corner and the other 3 corners (edges lone-other are cut)
+    # two triangles: 2 corners above (a, b) and 2 below (c, d) (edges a-c, a-d, b-d, b-c are cut)
+    single = np.full((16, 4), -1)
+    double = np.full((16, 4), -1)
+    for code in range(16):
+        above = [i for i in range(4) if code >> i & 1]
+        below = [i for i in range(4) if not code >> i & 1]
+        if len(above) in (1, 3):
+            lone = above if len(above) == 1 else below
+            single[code] = lone + [i for i in range(4) if i != lone[0]]
+        elif len(above) == 2:
+            double[code] = above + below
+    return single, double
+
+
+SINGLE_CASES, DOUBLE_CASES = _tetrahedron_tables()
+
+
+def marching_tetrahedra(density, isovalue):
+    """
+    Triangle mesh of the isosurface of a periodic grid, in grid index coordinates.
+
+    Every grid cube is split into 6 tetrahedra (a table of 16 cases instead of
+    the 256 of marching cubes, which vectorizes well in NumPy). The grid is
+    wrapped by one layer, so the surface is closed across the cell faces.
+
+    Parameters
+    ----------
+    density : numpy.ndarray
+        (nx, ny, nz) grid values, periodic.
+
+    isovalue : float
+        Value of the surface.
+
+    Returns
+    -------
+    vertices : numpy.ndarray
+        (v, 3) float32 vertex positions in (continuous) grid indices, between 0 and (nx, ny, nz).
+
+    faces : numpy.ndarray
+        (f, 3) int32 vertex indices of the triangles, oriented towards increasing values.
+    """
+    padded = np.pad(density, [(0, 1)] * 3, mode="wrap")
+    shape = np.array(padded.shape)
+    # only cubes with corners on both sides of the surface
+    cubes = np.argwhere(_crossing(padded, isovalue))
+    if len(cubes) == 0:
+        return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.int32)
+
+    # (t, 4, 3) corner indices of all tetrahedra of these cubes
+    corners = cubes[:, None, None, :] + CUBE_CORNERS[CUBE_TETRAHEDRA][None, :, :, :]
+    corners = corners.reshape(-1, 4, 3)
+    flat = np.ravel_multi_index(tuple(np.moveaxis(corners, -1, 0)), shape)
+    values = padded.reshape(-1)[flat]
+    codes = ((values > isovalue) * (1 << np.arange(4))).sum(axis=1)
+
+    edges = []
+    single = SINGLE_CASES[codes]
+    rows = np.nonzero(single[:, 0] >= 0)[0]
+    lone, others = single[rows, :1], single[rows, 1:]
+    edges.append(np.stack([np.broadcast_to(lone, others.shape), others], axis=-1))
+    edge_rows = [rows]
+    double = DOUBLE_CASES[codes]
+    rows = np.nonzero(double[:, 0] >= 0)[0]
+    a, b, c, d = double[rows].T
+    for triangle in ([(a, c), (a, d), (b, d)], [(a, c), (b, d), (b, c)]):
+        edges.append(np.stack([np.stack(edge, axis=-1) for edge in triangle], axis=1))
+        edge_rows.append(rows)
+    # (f, 3, 2) tetrahedron corners of the cut edges of every triangle
+    edges = np.concatenate(edges)
+    rows = np.concatenate(edge_rows)
+
+    ends = flat[rows[:, None, None], edges]
+    # weld: vertices on the same grid edge are the same vertex
+    keys = np.sort(ends, axis=-1).reshape(-1, 2)
+    keys, first, faces = np.unique(
+        keys[:, 0].astype(np.int64) * shape.prod() + keys[:, 1], return_index=True, return_inverse=True
+    )
+    faces = faces.reshape(-1, 3).astype(np.int32)
+
+    start = ends.reshape(-1, 2)[first]
+    v0, v1 = padded.reshape(-1)[start[:, 0]], padded.reshape(-1)[start[:, 1]]
+    t = ((isovalue - v0) / np.where(v1 == v0, 1, v1 - v0))[:, None]
+    p0 = np.stack(np.unravel_index(start[:, 0], shape), axis=-1)
+    p1 = np.stack(np.unravel_index(start[:, 1], shape), axis=-1)
+    vertices = (p0 + t * (p1 - p0)).astype(np.float32)
+
+    # orient all triangles towards increasing values (consistent normals for shading)
+    tetra_values = values[rows]
+    tetra_corners = corners[rows]
+    is_above = tetra_values > isovalue
+    gradient = (
+        (tetra_corners * is_above[..., None]).sum(axis=1) / np.maximum(is_above.sum(axis=1), 1)[:, None]
+        - (tetra_corners * ~is_above[..., None]).sum(axis=1) / np.maximum((~is_above).sum(axis=1), 1)[:, None]
+    )
+    triangle = vertices[faces]
+    normal = np.cross(triangle[:, 1] - triangle[:, 0], triangle[:, 2] - triangle[:, 0])
+    flip = (normal * gradient).sum(axis=1) < 0
+    faces[flip] = faces[flip][:, ::-1]
+    return vertices, faces
+
+
+def _crossing(padded, isovalue):
+    # (nx, ny, nz) mask of the cubes of a wrapped grid the surface passes through
+    above = padded > isovalue
+    nx, ny, nz = np.array(padded.shape) - 1
+    corner_above = [above[ox : ox + nx, oy : oy + ny, oz : oz + nz] for ox, oy, oz in CUBE_CORNERS]
+    return np.logical_or.reduce(corner_above) & ~np.logical_and.reduce(corner_above)
+
+
+def decimate(vertices, faces, max_faces):
+    """
+    Reduce a mesh to at most max_faces triangles by vertex clustering.
+
+    Vertices are merged per cluster of a regular grid into their mean (the
+    cluster size starts at the expected factor and grows until the budget is
+    met); triangles collapsing to lines or points are dropped.
+
+    Returns
+    -------
+    vertices, faces : numpy.ndarray
+        The decimated mesh (unchanged if it fits the budget already).
+    """
+    size = 1.0
+    while len(faces) > max_faces:
+        # the number of triangles of a surface shrinks with the square of the cluster size
+        size *= max(1.25, np.sqrt(len(faces) / max_faces))
+        clusters = np.floor(vertices / size).astype(np.int64)
+        clusters -= clusters.min(axis=0)
+        extent = clusters.max(axis=0) + 1
+        keys = (clusters[:, 0] * extent[1] + clusters[:, 1]) * extent[2] + clusters[:, 2]
+        _, cluster_of, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        cluster_of = cluster_of.reshape(-1)
+        merged = np.stack(
+            [np.bincount(cluster_of, weights=vertices[:, axis], minlength=len(counts)) for axis in range(3)],
+            axis=-1,
+        )
+        merged /= counts[:, None]
+        faces = cluster_of[faces]
+        faces = faces[
+            (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+        ]
+        vertices = merged.astype(np.float32)
+        if len(vertices) <= 3:
+            break
+    # drop vertices no triangle uses anymore
+    used, faces = np.unique(faces, return_inverse=True)
+    return vertices[used], faces.reshape(-1, 3).astype(np.int32)
+
+
+def isosurface_mesh(density, voxel, isovalue, max_faces):
+    """
+    Cartesian isosurface mesh of a (sheared) periodic grid, decimated to at most max_faces triangles.
+
+    Returns
+    -------
+    mesh : dict
+        "vertices": (v, 3) float32 Cartesian positions, "faces": (f, 3) int32 vertex indices.
+    """
+    # far too fine surfaces (a few triangles per crossed cube) are extracted from a block averaged grid instead
+    scale, offset = 1.0, 0.0
+    while max(density.shape) > 2:
+        crossed = _crossing(np.pad(density, [(0, 1)] * 3, mode="wrap"), isovalue).sum()
+        # about 4 triangles per crossed cube - up to 4 times the budget is left to the decimation
+        if crossed <= max_faces:
+            break
+        density = block_average(density)
+        # point i of the averaged grid lies between points 2i and 2i + 1
+        offset += 0.5 * scale
+        scale *= 2
+    vertices, faces = marching_tetrahedra(density, isovalue)
+    vertices, faces = decimate(vertices * scale + offset, faces, max_faces)
+    return {"vertices": to_cartesian(vertices, voxel), "faces": faces}
+
+
+class MeshCache:
+    """
+    LRU cache of isosurface meshes, f.e. keyed by (dataset version, isovalue).
+
+    Parameters
+    ----------
+    max_entries : int
+        Number of meshes kept.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        Cached mesh for key, compute() is called (and its result cached) on a miss.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        mesh = compute()
+        with self._lock:
+            self._entries[key] = mesh
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return mesh
@@ -1,13 +1,40 @@
 """Script for single MALA inference."""
 import json
+import os
 import time
 
 import mala
 import numpy as np
 
+from src.utils.model_registry import ModelRegistry
+
 # Set up the path to the model.
 MODELS = json.load(open("../src/models/model_paths.json"))
 
+# Loaded models are kept in memory, so repeated inferences skip loading the model run.
+# Evicted least-recently-used beyond MAX_LOADED_MODELS or MODEL_MEMORY_BUDGET (MB).
+MAX_LOADED_MODELS = int(os.environ.get("MALAWEB_MAX_LOADED_MODELS", 2))
+MODEL_MEMORY_BUDGET = os.environ.get("MALAWEB_MODEL_MEMORY_BUDGET")
+# comma separated model names (f.e. "Be|298") to load on startup
+PRELOAD_MODELS = [
+    name for name in os.environ.get("MALAWEB_PRELOAD_MODELS", "").split(",") if name
+]
+
+REGISTRY = ModelRegistry(
+    MODELS,
+    path="models",
+    max_models=MAX_LOADED_MODELS,
+    memory_budget=None if MODEL_MEMORY_BUDGET is None else int(MODEL_MEMORY_BUDGET) * 1024**2,
+)
+
+
+def init_worker():
+    """
+    Initializer for inference worker processes: loads PRELOAD_MODELS before the first job arrives.
+    """
+    REGISTRY.preload(PRELOAD_MODELS)
+
+
 model_paths = {
     "Be|298": "Be_model",
     "Al|298": None,
@@ -18,7 +45,7 @@ model_paths = {
 
 
 def run_mala_prediction(atoms_to_predict, model_and_temp, session_id,
-                        calc_total_energy=True):
+                        calc_total_energy=True, ldos_file=None):
     """
     Perform a MALA prediction for an ase.Atoms object.
 
@@ -38,6 +65,14 @@ def run_mala_prediction(atoms_to_predict, model_and_temp, session_id,
         Download component is expecting file with name "inference_data.cube"
         Path would be: "../sessions/<session_id>/density.cube"
 
+    calc_total_energy : bool
+        Whether to calculate the (expensive) total energy.
+
+    ldos_file : string
+        .npy file to keep the predicted LDOS in, (nx, ny, nz, ldos_dim) - results
+        for other temperatures are then derived from it by run_from_ldos and
+        run_temperature_sweep, without predicting again. None to not keep it.
+
     Returns
     -------
     results : dict
@@ -48,6 +83,8 @@ def run_mala_prediction(atoms_to_predict, model_and_temp, session_id,
             "total_energy": The total energy of the system, which is the
                             principal quantity to investigate when e.g.
                             optimizing the atomic geometry of a system.
+                            NaN without calc_total_energy (see
+                            run_total_energy).
 
             "density": Electronic density as a 3D numpy array, which
                        gives information about the electronic distribution.
@@ -81,32 +118,137 @@ def run_mala_prediction(atoms_to_predict, model_and_temp, session_id,
         }
         return results
     else:
-        parameters, network, data_handler, predictor = mala.Predictor.load_run(
-            MODELS[model_and_temp["name"]], path="models"
-        )
-        predicted_ldos = predictor.predict_for_atoms(atoms_to_predict)
+        # the predictor (and its target calculator) is exclusively ours inside this block
+        with REGISTRY.use(model_and_temp["name"]) as predictor:
+            return _predict(predictor, atoms_to_predict, calc_total_energy,
+                            model_and_temp["temperature"], ldos_file)
 
-        ldos_calculator: mala.LDOS
-        ldos_calculator = predictor.target_calculator
-        ldos_calculator.read_from_array(predicted_ldos)
 
-        results = {
-            "band_energy": ldos_calculator.band_energy,
-            # Reshaping for plotting.
-            "density": np.reshape(
-                ldos_calculator.density, ldos_calculator.grid_dimensions
-            ),
-            "density_of_states": ldos_calculator.density_of_states,
-            "energy_grid": ldos_calculator.energy_grid,
-            "fermi_energy": ldos_calculator.fermi_energy,
-            "voxel": ldos_calculator.voxel,
-            "grid_dimensions": ldos_calculator.grid_dimensions,
-        }
-        if calc_total_energy:
-            results["total_energy"] = ldos_calculator.total_energy
-        else:
-            results["total_energy"] = 0.0
-        return results
+def run_from_ldos(atoms_to_predict, model_and_temp, ldos_file,
+                  calc_total_energy=True):
+    """
+    Results of run_mala_prediction for another temperature, derived from a kept LDOS.
+
+    Parameters
+    ----------
+    atoms_to_predict : ase.Atoms
+        Atoms the LDOS was predicted for.
+
+    model_and_temp : dict
+        Name of the model the LDOS was predicted with and the new temperature.
+
+    ldos_file : string
+        LDOS kept by run_mala_prediction (read memory-mapped).
+
+    calc_total_energy : bool
+        Whether to calculate the (expensive) total energy.
+
+    Returns
+    -------
+    results : dict
+        Same layout as returned by run_mala_prediction.
+    """
+    ldos = np.load(ldos_file, mmap_mode="r")
+    with REGISTRY.use(model_and_temp["name"]) as predictor:
+        ldos_calculator = _ldos_calculator(predictor, atoms_to_predict, ldos)
+        return _evaluate(ldos_calculator, ldos, model_and_temp["temperature"], calc_total_energy)
+
+
+def run_total_energy(atoms_to_predict, model_and_temp, ldos_file):
+    """
+    Total energy of an inference run without it, from its kept LDOS (see run_mala_prediction).
+
+    The most expensive part of the post-processing, so it is computed
+    separately, after the density and the other energies are shown.
+
+    Returns
+    -------
+    total_energy : float
+    """
+    ldos = np.load(ldos_file, mmap_mode="r")
+    with REGISTRY.use(model_and_temp["name"]) as predictor:
+        ldos_calculator = _ldos_calculator(predictor, atoms_to_predict, ldos)
+        ldos_calculator.temperature = model_and_temp["temperature"]
+        ldos_calculator.read_from_array(ldos)
+        return float(ldos_calculator.total_energy)
+
+
+def run_temperature_sweep(atoms_to_predict, model_name, ldos_file, temperatures):
+    """
+    Band and Fermi energy for a list of temperatures, derived from a kept LDOS (see run_from_ldos).
+
+    Returns
+    -------
+    energies : list
+        One dict per temperature: "temperature", "band_energy", "fermi_energy".
+    """
+    ldos = np.load(ldos_file, mmap_mode="r")
+    energies = []
+    with REGISTRY.use(model_name) as predictor:
+        ldos_calculator = _ldos_calculator(predictor, atoms_to_predict, ldos)
+        for temperature in temperatures:
+            ldos_calculator.temperature = temperature
+            # re-reading drops the properties cached for the previous temperature
+            ldos_calculator.read_from_array(ldos)
+            energies.append({"temperature": temperature,
+                             "band_energy": float(ldos_calculator.band_energy),
+                             "fermi_energy": float(ldos_calculator.fermi_energy)})
+    return energies
+
+
+def _ldos_calculator(predictor, atoms_to_predict, ldos):
+    # the predictor's calculator describes the last prediction it ran, not necessarily this one
+    ldos_calculator: mala.LDOS
+    ldos_calculator = predictor.target_calculator
+    ldos_calculator.read_additional_calculation_data(
+        [atoms_to_predict, list(ldos.shape[:3])]
+    )
+    return ldos_calculator
+
+
+def _predict(predictor, atoms_to_predict, calc_total_energy, temperature=None,
+             ldos_file=None):
+    """
+    Run the prediction with an already loaded predictor, see run_mala_prediction.
+    """
+    predicted_ldos = predictor.predict_for_atoms(atoms_to_predict)
+
+    ldos_calculator: mala.LDOS
+    ldos_calculator = predictor.target_calculator
+    if ldos_file is not None:
+        # (nx, ny, nz, ldos_dim), so run_from_ldos knows the grid without the calculator
+        np.save(ldos_file, np.reshape(
+            predicted_ldos, list(ldos_calculator.grid_dimensions) + [-1]
+        ))
+    return _evaluate(ldos_calculator, predicted_ldos, temperature,
+                     calc_total_energy)
+
+
+def _evaluate(ldos_calculator, ldos, temperature, calc_total_energy):
+    """
+    Density, DOS and energies of an LDOS at a temperature (None keeps the calculator's).
+    """
+    if temperature is not None:
+        ldos_calculator.temperature = temperature
+    ldos_calculator.read_from_array(ldos)
+
+    results = {
+        "band_energy": ldos_calculator.band_energy,
+        # Reshaping for plotting.
+        "density": np.reshape(
+            ldos_calculator.density, ldos_calculator.grid_dimensions
+        ),
+        "density_of_states": ldos_calculator.density_of_states,
+        "energy_grid": ldos_calculator.energy_grid,
+        "fermi_energy": ldos_calculator.fermi_energy,
+        "voxel": ldos_calculator.voxel,
+        "grid_dimensions": ldos_calculator.grid_dimensions,
+    }
+    if calc_total_energy:
+        results["total_energy"] = ldos_calculator.total_energy
+    else:
+        results["total_energy"] = float("nan")
+    return results
 
 
 def save_density_to_file(results, file_name):
@@ -0,0 +1,122 @@
+"""Registry keeping loaded MALA predictors warm in memory."""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import mala
+
+
+class ModelRegistry:
+    """
+    Loads every MALA model only once and keeps the predictors in memory.
+
+    Predictors are evicted least-recently-used first, as soon as either more
+    than `max_models` are loaded or their estimated size exceeds `memory_budget`.
+    A predictor is stateful (its target calculator holds the last prediction),
+    so it can only be used by one inference at a time, see `use`.
+
+    Parameters
+    ----------
+    model_paths : dict
+        Maps model names (f.e. "Be|298") to the name of the model run, as in
+        models/model_paths.json. Models without a run are mapped to "null".
+
+    path : string
+        Folder containing the model runs.
+
+    max_models : int
+        Maximum number of predictors kept in memory.
+
+    memory_budget : int
+        Maximum estimated size of all kept predictors in bytes. None for no limit.
+    """
+
+    def __init__(self, model_paths, path="models", max_models=2, memory_budget=None):
+        self.model_paths = model_paths
+        self.path = path
+        self.max_models = max_models
+        self.memory_budget = memory_budget
+        # name -> (predictor, estimated size in bytes)
+        self._predictors = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def use(self, name):
+        """
+        Context manager handing out the (loaded) predictor for a model exclusively.
+
+        Parameters
+        ----------
+        name : string
+            Name of the model, key of model_paths.
+
+        Yields
+        ------
+        predictor : mala.Predictor
+        """
+        with self._model_lock(name):
+            yield self._get(name)
+
+    def preload(self, names):
+        """
+        Load models ahead of the first inference (f.e. on startup).
+        Unknown models or models without a run are skipped.
+        """
+        for name in names:
+            if self.model_paths.get(name, "null") == "null":
+                print("Not preloading model", name, "- no model data available")
+                continue
+            with self._model_lock(name):
+                self._get(name)
+
+    def loaded_models(self):
+        """
+        Names of the currently loaded models, least recently used first.
+        """
+        with self._lock:
+            return list(self._predictors.keys())
+
+    def _model_lock(self, name):
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _get(self, name):
+        # caller holds the lock of this model, so it's loaded at most once
+        with self._lock:
+            if name in self._predictors:
+                self._predictors.move_to_end(name)
+                return self._predictors[name][0]
+
+        print("Loading model", name)
+        parameters, network, data_handler, predictor = mala.Predictor.load_run(
+            self.model_paths[name], path=self.path
+        )
+        size = self._estimate_size(network)
+
+        with self._lock:
+            self._predictors[name] = (predictor, size)
+            self._evict(keep=name)
+        return predictor
+
+    def _evict(self, keep):
+        def over_budget():
+            if len(self._predictors) > self.max_models:
+                return True
+            if self.memory_budget is None:
+                return False
+            return sum(size for _, size in self._predictors.values()) > self.memory_budget
+
+        for name in list(self._predictors.keys()):
+            if not over_budget():
+                break
+            if name != keep:
+                print("Unloading model", name)
+                del self._predictors[name]
+
+    @staticmethod
+    def _estimate_size(network):
+        """
+        Size of the network parameters in bytes - the dominant part of a loaded predictor.
+        """
+        return sum(param.numel() * param.element_size() for param in network.parameters())
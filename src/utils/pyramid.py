@@ -0,0 +1,149 @@
+"""Multi-resolution pyramid of the density grid, for rendering within a point budget."""
+import numpy as np
+
+from src.utils.slicing import slice_grid
+from src.utils.value_index import value_mask
+
+
+def block_average(array):
+    """
+    Halve the resolution of the first 3 axes by averaging blocks of 2x2x2 grid points.
+
+    Odd axes keep their last layer as a block of its own, so (n + 1) // 2 points remain per axis.
+    """
+    for axis in range(3):
+        n = array.shape[axis]
+        starts = np.arange(0, n, 2)
+        counts = np.minimum(2, n - starts).astype(np.float32)
+        shape = [1] * array.ndim
+        shape[axis] = len(starts)
+        array = np.add.reduceat(array, starts, axis=axis) / counts.reshape(shape)
+    return array
+
+
+def build_pyramid(density, coords, point_budget):
+    """
+    Block averaged levels of a grid, down to the first level that fits the point budget.
+
+    Parameters
+    ----------
+    density : numpy.ndarray
+        (nx, ny, nz) density values (level 0).
+
+    coords : numpy.ndarray
+        (nx, ny, nz, 3) cartesian coordinates of the grid points.
+
+    point_budget : int
+        Number of points the coarsest level may have at most.
+
+    Returns
+    -------
+    pyramid : dict
+        "pyramid_levels": number of levels (including level 0),
+        "density_<l>" and "coords_<l>" for levels l >= 1, with 2^l x 2^l x 2^l grid points per point
+        (averages of their density and coordinates).
+    """
+    pyramid = {}
+    level = 0
+    while density.size > point_budget and max(density.shape) > 1:
+        level += 1
+        density = block_average(density).astype(np.float32)
+        coords = block_average(coords).astype(np.float32)
+        pyramid[f"density_{level}"] = density
+        pyramid[f"coords_{level}"] = coords
+    pyramid["pyramid_levels"] = level + 1
+    return pyramid
+
+
+def extend_pyramid(dataset, point_budget):
+    """
+    Add coarser levels to the dataset's pyramid (in place) until its coarsest level fits the point budget.
+
+    Used when a smaller budget than the one the pyramid was built for is needed
+    (f.e. repeated cells sharing the budget). Only the in-memory dataset is
+    extended, a dataset reloaded from disk builds the levels again when needed.
+    """
+    level = int(dataset.get("pyramid_levels", 1)) - 1
+    density, coords = pyramid_level(dataset, level)
+    while density.size > point_budget and max(density.shape) > 1:
+        level += 1
+        density = block_average(density).astype(np.float32)
+        coords = block_average(coords).astype(np.float32)
+        dataset[f"density_{level}"] = density
+        dataset[f"coords_{level}"] = coords
+        # counted last, so concurrent readers only see complete levels
+        dataset["pyramid_levels"] = level + 1
+    return dataset
+
+
+def pyramid_level(dataset, level):
+    """
+    (density, coords) of a level of the dataset's pyramid.
+    """
+    if level == 0:
+        return dataset["density"], dataset["coords"]
+    return dataset[f"density_{level}"], dataset[f"coords_{level}"]
+
+
+def level_ranges(ranges, level):
+    """
+    Index ranges of level 0 (see slicing.index_slices) translated to a level of the pyramid.
+    """
+    return [None if r is None else [min(r) >> level, max(r) >> level] for r in ranges]
+
+
+def choose_level(dataset, ranges, point_budget):
+    """
+    Finest level whose slice (before value filtering) fits the point budget, the coarsest level if none does.
+    """
+    levels = int(dataset.get("pyramid_levels", 1))
+    for level in range(levels):
+        density, _ = pyramid_level(dataset, level)
+        size = 1
+        for n, r in zip(density.shape, level_ranges(ranges, level)):
+            size *= n if r is None else max(0, min(r[1], n - 1) - max(r[0], 0) + 1)
+        if size <= point_budget:
+            return level
+    return levels - 1
+
+
+def slice_pyramid(dataset, ranges, value_range, point_budget):
+    """
+    Visible subset of the grid at the finest level that fits the point budget.
+
+    Parameters
+    ----------
+    dataset : dict
+        Dataset holding the density, coordinates, value index and pyramid.
+
+    ranges : list
+        Index ranges of level 0 per lattice axis, see slicing.index_slices.
+
+    value_range : list
+        [low, high] density values (inclusive) to keep, None for all.
+        Coarse levels are filtered by their averaged density.
+
+    point_budget : int
+        Number of points that may be rendered.
+
+    Returns
+    -------
+    coords : numpy.ndarray
+        (m, 3) coordinates of the visible points.
+
+    values : numpy.ndarray
+        (m,) density of the visible points.
+
+    level : int
+        Level of the pyramid the points are taken from.
+    """
+    level = choose_level(extend_pyramid(dataset, point_budget), ranges, point_budget)
+    density, coords = pyramid_level(dataset, level)
+    mask = None
+    if value_range is not None:
+        if level == 0:
+            mask = value_mask(dataset, density.shape, value_range)
+        else:
+            mask = (density >= value_range[0]) & (density <= value_range[1])
+    coords, values = slice_grid(density, coords, level_ranges(ranges, level), mask)
+    return coords, values, level
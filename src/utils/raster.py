@@ -0,0 +1,123 @@
+"""Rendering of lattice planes of the density grid as PNG images."""
+import base64
+import struct
+import zlib
+
+import numpy as np
+from plotly.colors import hex_to_rgb, unlabel_rgb
+
+
+def plane_frame(voxel, axis):
+    """
+    2D basis of a lattice plane (the plane spanned by the two voxel vectors other than `axis`).
+
+    Returns
+    -------
+    basis : numpy.ndarray
+        (2, 2) array, rows are the two in-plane voxel vectors in an orthonormal frame of the plane
+        (the first one along the frame's x-axis).
+    """
+    u, v = np.delete(np.asarray(voxel, dtype=np.float64), axis, axis=0)
+    e1 = u / np.linalg.norm(u)
+    e2 = v - (v @ e1) * e1
+    e2 /= np.linalg.norm(e2)
+    return np.array([[u @ e1, 0.0], [v @ e1, v @ e2]])
+
+
+def plane_values(density, voxel, axis, index, resolution):
+    """
+    Resample one lattice plane of the grid onto a square pixel raster.
+
+    The plane is taken as a view of the grid. A sheared plane is drawn as the
+    parallelogram it is (pixels outside of it are NaN), values inside are
+    interpolated bilinearly (periodic).
+
+    Parameters
+    ----------
+    density : numpy.ndarray
+        (nx, ny, nz) grid values.
+
+    voxel : array_like
+        (3, 3) array of the voxel vectors, one per row.
+
+    axis : int
+        Lattice axis normal to the plane (0, 1 or 2).
+
+    index : int
+        Grid index of the plane along that axis.
+
+    resolution : int
+        Number of pixels along the longer side of the image.
+
+    Returns
+    -------
+    values : numpy.ndarray
+        (height, width) array, row 0 is the top of the image.
+    """
+    plane = np.take(density, index, axis=axis)
+    shape = np.array(plane.shape)
+    basis = plane_frame(voxel, axis)
+    corners = np.array([[0, 0], [1, 0], [0, 1], [1, 1]]) * shape @ basis
+    low, high = corners.min(axis=0), corners.max(axis=0)
+    pixel = (high - low).max() / resolution
+    width, height = np.maximum(1, np.ceil((high - low) / pixel).astype(int))
+
+    # pixel centres, top row first
+    x = low[0] + (np.arange(width) + 0.5) * pixel
+    y = high[1] - (np.arange(height) + 0.5) * pixel
+    points = np.stack(np.meshgrid(x, y), axis=-1).reshape(-1, 2)
+    indices = points @ np.linalg.inv(basis)
+    inside = np.all((indices >= 0) & (indices <= shape), axis=1)
+
+    base = np.floor(indices).astype(int)
+    weights = indices - base
+    values = np.zeros(len(points))
+    for offset in [(0, 0), (1, 0), (0, 1), (1, 1)]:
+        corner = (base + offset) % shape
+        weight = np.prod(np.where(offset, weights, 1 - weights), axis=1)
+        values += weight * plane[corner[:, 0], corner[:, 1]]
+    values[~inside] = np.nan
+    return values.reshape(height, width)
+
+
+def colormap(values, v_min, v_max, colorscale):
+    """
+    Map values to RGBA colours of a plotly colorscale (f.e. px.colors.sequential.Inferno_r). NaN is transparent.
+
+    Returns
+    -------
+    rgba : numpy.ndarray
+        (..., 4) uint8 array.
+    """
+    colors = np.array(
+        [hex_to_rgb(c) if c.startswith("#") else unlabel_rgb(c) for c in colorscale], dtype=np.float64
+    )
+    stops = np.linspace(0, 1, len(colors))
+    scaled = np.clip((values - v_min) / ((v_max - v_min) or 1), 0, 1)
+    rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.round(np.interp(np.nan_to_num(scaled), stops, colors[:, channel]))
+    rgba[..., 3] = np.where(np.isnan(values), 0, 255)
+    return rgba
+
+
+def encode_png(rgba):
+    """
+    Encode an (height, width, 4) uint8 array as PNG data URI.
+    """
+    height, width, _ = rgba.shape
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    # every row starts with its filter type: 2 ("up", difference to the row above) compresses smooth images best
+    rows = rgba.reshape(height, -1)
+    rows = np.concatenate([rows[:1], rows[1:] - rows[:-1]])  # uint8 wraps around, as the filter requires
+    rows = np.concatenate([np.full((height, 1), 2, dtype=np.uint8), rows], axis=1)
+    png = (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+    return "data:image/png;base64," + base64.b64encode(png).decode()
@@ -0,0 +1,134 @@
+"""Persistent, content-addressed cache of inference results."""
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# Everything run_mala_prediction returns that is needed to show an inference again
+RESULT_KEYS = [
+    "band_energy",
+    "total_energy",
+    "fermi_energy",
+    "density",
+    "density_of_states",
+    "energy_grid",
+    "voxel",
+    "grid_dimensions",
+]
+
+
+class ResultCache:
+    """
+    Stores inference results as .npz files named after the hash of their inputs.
+
+    The same structure run with the same model and temperature always maps to
+    the same file, regardless of the session it was uploaded in. When the files
+    exceed `max_bytes`, the least recently used ones are deleted (usage is
+    tracked via the modification time, which `get` refreshes).
+
+    Parameters
+    ----------
+    root : string
+        Folder holding the cached results.
+
+    max_bytes : int
+        Size cap of all cached results together.
+    """
+
+    def __init__(self, root, max_bytes=1024**3):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(atoms, model_and_temp):
+        """
+        Hash identifying an inference.
+
+        Parameters
+        ----------
+        atoms : ase.Atoms
+            Structure the inference is run on (positions, cell, numbers and pbc are hashed).
+
+        model_and_temp : dict
+            "name" of the model and "temperature", as passed to run_mala_prediction.
+
+        Returns
+        -------
+        key : string
+            Hex digest (sha256).
+        """
+        digest = hashlib.sha256()
+        for array in [
+            np.asarray(atoms.get_positions(), dtype="<f8"),
+            np.asarray(atoms.get_cell(), dtype="<f8"),
+            np.asarray(atoms.get_atomic_numbers(), dtype="<i8"),
+            np.asarray(atoms.get_pbc(), dtype=bool),
+        ]:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        digest.update(model_and_temp["name"].encode())
+        digest.update(repr(float(model_and_temp["temperature"])).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Cached results for key (same layout as returned by run_mala_prediction), None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as stored:
+                results = {name: stored[name] for name in stored.files}
+        except FileNotFoundError:
+            return None
+        # mark as recently used
+        path.touch()
+        return {
+            name: value.item() if value.ndim == 0 else value
+            for name, value in results.items()
+        }
+
+    def energies(self, key):
+        """
+        Only the energies ("band_energy", "total_energy", "fermi_energy") of the cached results for key,
+        without loading the density, None on a miss.
+        """
+        try:
+            # members of an .npz are only read when accessed
+            with np.load(self._path(key)) as stored:
+                return {name: float(stored[name]) for name in ["band_energy", "total_energy", "fermi_energy"]}
+        except FileNotFoundError:
+            return None
+
+    def contains(self, key):
+        """
+        True if results for key are cached.
+        """
+        return self._path(key).exists()
+
+    def put(self, key, results):
+        """
+        Cache the results of an inference and evict old results beyond the size cap.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        # written under a temporary name, so concurrent readers never see half a file
+        tmp = path.with_name(f"{key}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **{name: np.asarray(results[name]) for name in RESULT_KEYS})
+        tmp.replace(path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            files = sorted(self.root.glob("*.npz"), key=lambda f: f.stat().st_mtime)
+            total = sum(f.stat().st_size for f in files)
+            for f in files[:-1]:
+                if total <= self.max_bytes:
+                    break
+                total -= f.stat().st_size
+                f.unlink(missing_ok=True)
+
+    def _path(self, key):
+        return self.root / f"{key}.npz"
@@ -0,0 +1,73 @@
+"""Slicing of the density grid in index (lattice) space."""
+import numpy as np
+
+
+def index_slices(shape, ranges):
+    """
+    Translate slider ranges into slices of the grid.
+
+    Parameters
+    ----------
+    shape : tuple
+        Grid dimensions (nx, ny, nz).
+
+    ranges : list
+        One [low, high] pair of (inclusive) grid indices per lattice axis, None for the full axis.
+
+    Returns
+    -------
+    slices : tuple
+        One slice per axis, usable as view into the density and coordinate arrays.
+    """
+    slices = []
+    for n, index_range in zip(shape, ranges):
+        if index_range is None:
+            slices.append(slice(0, n))
+        else:
+            low, high = sorted(index_range)
+            slices.append(slice(max(0, int(low)), min(n, int(high) + 1)))
+    return tuple(slices)
+
+
+def slice_grid(density, coords, ranges, mask=None):
+    """
+    Visible subset of the grid for the given ranges.
+
+    Parameters
+    ----------
+    density : numpy.ndarray
+        (nx, ny, nz) density values.
+
+    coords : numpy.ndarray
+        (nx, ny, nz, 3) cartesian coordinates of the grid points.
+
+    ranges : list
+        Index ranges per lattice axis, see index_slices.
+
+    mask : numpy.ndarray
+        (nx, ny, nz) boolean array of the points to keep (f.e. a value_index.value_mask), None for all.
+
+    Returns
+    -------
+    coords : numpy.ndarray
+        (m, 3) coordinates of the visible points.
+
+    values : numpy.ndarray
+        (m,) density of the visible points.
+    """
+    slices = index_slices(density.shape, ranges)
+    # views - nothing is copied before the (much smaller) subset is flattened
+    values = density[slices].reshape(-1)
+    coords = coords[slices].reshape(-1, 3)
+    if mask is not None:
+        mask = mask[slices].reshape(-1)
+        values = values[mask]
+        coords = coords[mask]
+    return coords, values
+
+
+def fractional_axis(n):
+    """
+    Fractional (lattice) coordinates of the n grid points along one axis.
+    """
+    return np.arange(n) / n
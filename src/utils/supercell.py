@@ -0,0 +1,131 @@
+"""Detection of supercells (exact repetitions of a smaller cell), so inferences can run on the smaller cell."""
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Energies and DOS that grow with the number of cells (the Fermi energy and the energy grid don't)
+EXTENSIVE_KEYS = ["band_energy", "total_energy", "density_of_states"]
+
+
+def _wrap(fractional):
+    # into [0, 1) as the periodic KD-tree requires (x % 1.0 is 1.0 for tiny negative x)
+    fractional = np.mod(fractional, 1.0)
+    fractional[fractional >= 1.0] = 0.0
+    return fractional
+
+
+def _element_trees(fractional, numbers):
+    # periodic KD-tree of the (fractional) positions of every element
+    return {
+        number: cKDTree(_wrap(fractional[numbers == number]), boxsize=1.0) for number in np.unique(numbers)
+    }
+
+
+def _matches(positions, tree, cell, tolerance):
+    # for every (fractional) position: is there a target within tolerance, across the periodic boundaries?
+    # the nearest target is looked up in fractional coordinates and its distance checked in Angstrom
+    nearest = tree.query(_wrap(positions))[1]
+    difference = positions - tree.data[nearest]
+    difference -= np.round(difference)
+    return np.linalg.norm(difference @ cell, axis=-1) < tolerance
+
+
+def _is_translation_symmetric(fractional, numbers, trees, cell, shift, tolerance):
+    # does translating all atoms by shift (fractional) map every atom onto one of the same element?
+    # cheap rejection of most candidates by the first atom alone
+    if not _matches(fractional[:1] + shift, trees[numbers[0]], cell, tolerance)[0]:
+        return False
+    for number, tree in trees.items():
+        if not np.all(_matches(fractional[numbers == number] + shift, tree, cell, tolerance)):
+            return False
+    return True
+
+
+def find_supercell(atoms, tolerance=1e-4):
+    """
+    Largest repetition n x m x k of a smaller cell that a periodic structure consists of.
+
+    A repetition along a cell vector is found if translating the structure by
+    1/n of that vector maps every atom onto an atom of the same element.
+
+    Parameters
+    ----------
+    atoms : ase.Atoms
+        Periodic structure (f.e. ase.build.bulk(...) * (2, 2, 2)).
+
+    tolerance : float
+        Distance (Angstrom) up to which two atoms are considered the same.
+
+    Returns
+    -------
+    repeat : tuple
+        (n, m, k) copies of the smaller cell along the cell vectors, (1, 1, 1) if there is none.
+    """
+    if len(atoms) < 2 or not all(atoms.pbc):
+        return 1, 1, 1
+    # every copy holds the same number of atoms of every element
+    numbers = atoms.get_atomic_numbers()
+    counts = np.unique(numbers, return_counts=True)[1]
+    fractional = atoms.get_scaled_positions(wrap=True)
+    cell = np.asarray(atoms.cell)
+    trees = _element_trees(fractional, numbers)
+    repeat = []
+    for axis in range(3):
+        found = 1
+        # the largest repetition first
+        for n in range(int(counts.min()), 1, -1):
+            if np.any(counts % (n * int(np.prod(repeat or [1])))):
+                continue
+            shift = np.zeros(3)
+            shift[axis] = 1 / n
+            if _is_translation_symmetric(fractional, numbers, trees, cell, shift, tolerance):
+                found = n
+                break
+        repeat.append(found)
+    return tuple(repeat)
+
+
+def reduce_supercell(atoms, repeat, tolerance=1e-4):
+    """
+    The smaller cell a supercell is an n x m x k repetition of (see find_supercell).
+
+    Returns
+    -------
+    reduced : ase.Atoms
+        Atoms of the first copy of the smaller cell (positions unchanged), with the reduced cell.
+    """
+    repeat = np.asarray(repeat)
+    copy = np.floor(atoms.get_scaled_positions(wrap=True) * repeat + tolerance).astype(int) % repeat
+    reduced = atoms[np.all(copy == 0, axis=1)]
+    reduced.set_cell(np.asarray(atoms.cell) / repeat[:, None], scale_atoms=False)
+    if len(reduced) * repeat.prod() != len(atoms):
+        raise ValueError("atoms are no repetition of " + "x".join(map(str, repeat)) + " cells")
+    return reduced
+
+
+def tile_result(results, repeat):
+    """
+    Inference results of a smaller cell expanded to its n x m x k supercell.
+
+    The density is tiled (the voxel stays the same), extensive quantities
+    (band and total energy, DOS) are scaled by the number of copies.
+
+    Parameters
+    ----------
+    results : dict
+        As returned by run_mala_prediction for the smaller cell.
+
+    repeat : sequence
+        (n, m, k) copies of the smaller cell.
+
+    Returns
+    -------
+    results : dict
+        A new dict in the same layout, for the supercell.
+    """
+    copies = int(np.prod(repeat))
+    tiled = dict(results)
+    tiled["density"] = np.tile(results["density"], tuple(repeat))
+    tiled["grid_dimensions"] = [int(n) * int(r) for n, r in zip(results["grid_dimensions"], repeat)]
+    for key in EXTENSIVE_KEYS:
+        tiled[key] = np.asarray(results[key]) * copies if np.ndim(results[key]) else float(results[key]) * copies
+    return tiled
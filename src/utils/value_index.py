@@ -0,0 +1,84 @@
+"""Sorted index of the density values, for filtering by value without re-sorting."""
+import numpy as np
+
+
+def build_value_index(density, steps=200, mode="quantile"):
+    """
+    Sort the density once and derive the steps of the density slider from it.
+
+    Parameters
+    ----------
+    density : numpy.ndarray
+        Density grid (any shape).
+
+    steps : int
+        Number of slider steps, the slider gets steps + 1 positions (fewer for tiny grids).
+
+    mode : string
+        "quantile": positions are evenly spaced quantiles of the density,
+        "absolute": positions are evenly spaced density values between minimum and maximum.
+
+    Returns
+    -------
+    index : dict
+        "value_order": flat indices of the grid points sorted by density,
+        "value_sorted": the sorted density values,
+        "value_steps": density value of every slider position,
+        "value_below": number of grid points with a density below each step (cumulative histogram),
+        "value_upto": number of grid points with a density up to (and including) each step.
+    """
+    values = np.asarray(density).reshape(-1)
+    index_dtype = np.int32 if values.size < 2**31 else np.int64
+    order = np.argsort(values, kind="stable").astype(index_dtype, copy=False)
+    sorted_values = values[order]
+
+    steps = max(1, min(int(steps), values.size - 1))
+    if mode == "absolute":
+        value_steps = np.linspace(sorted_values[0], sorted_values[-1], steps + 1)
+        # exact ends, so the full range keeps every point
+        value_steps[0], value_steps[-1] = sorted_values[0], sorted_values[-1]
+    elif mode == "quantile":
+        # grid values (not interpolated quantiles), so both ends of a range are inclusive
+        value_steps = sorted_values[np.linspace(0, values.size - 1, steps + 1).round().astype(int)]
+    else:
+        raise ValueError(f"Unknown value slider mode: {mode}")
+    value_steps = value_steps.astype(values.dtype)
+
+    return {
+        "value_order": order,
+        "value_sorted": sorted_values,
+        "value_steps": value_steps,
+        "value_below": np.searchsorted(sorted_values, value_steps, side="left"),
+        "value_upto": np.searchsorted(sorted_values, value_steps, side="right"),
+    }
+
+
+def value_mask(index, shape, value_range):
+    """
+    Boolean mask of the grid points within a density range.
+
+    Two binary searches in the sorted values find the matching run of
+    value_order, whose indices are set in the mask - no comparison of every point.
+
+    Parameters
+    ----------
+    index : dict
+        Value index as returned by build_value_index.
+
+    shape : tuple
+        Shape of the density grid.
+
+    value_range : list
+        [low, high] density values (inclusive).
+
+    Returns
+    -------
+    mask : numpy.ndarray
+        Boolean array of the given shape.
+    """
+    low, high = value_range
+    start = np.searchsorted(index["value_sorted"], low, side="left")
+    stop = np.searchsorted(index["value_sorted"], high, side="right")
+    mask = np.zeros(int(np.prod(shape)), dtype=bool)
+    mask[index["value_order"][start:stop]] = True
+    return mask.reshape(shape)